@@ -6,4 +6,4 @@ class ProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'points', 'created_at')
     list_filter = ('created_at',)
     search_fields = ('user__username', 'user__email', 'bio')
-    readonly_fields = ('created_at',)
\ No newline at end of file
+    readonly_fields = ('points', 'created_at')
\ No newline at end of file
@@ -3,6 +3,7 @@ from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import User
 from .models import Profile, Follow
+from .points import award_points, FOLLOW_POINTS
 
 
 class FollowConsumer(AsyncWebsocketConsumer):
@@ -35,20 +36,15 @@ class FollowConsumer(AsyncWebsocketConsumer):
             profile, created = Profile.objects.get_or_create(user=user_to_follow)
             
             # Create follow relationship
-            Follow.objects.get_or_create(follower=self.user, following=user_to_follow)
+            follow, created = Follow.objects.get_or_create(follower=self.user, following=user_to_follow)
             
-            # Update points
-            profile.points += 5
-            profile.save()
-            
-            # Create notification
-            from notifications.models import Notification
-            Notification.objects.create(
-                recipient=user_to_follow,
-                sender=self.user,
-                notification_type='follow',
-                text=f'{self.user.username} started following you'
-            )
+            if created:
+                # Update points
+                award_points(user_to_follow.id, FOLLOW_POINTS)
+                
+                # Create notification
+                from notifications.aggregation import create_notification
+                create_notification(user_to_follow, self.user, 'follow')
             
             return {
                 'status': 'success',
@@ -67,11 +63,11 @@ class FollowConsumer(AsyncWebsocketConsumer):
             profile = Profile.objects.get(user=user_to_unfollow)
             
             # Remove follow relationship
-            Follow.objects.filter(follower=self.user, following=user_to_unfollow).delete()
+            deleted, _ = Follow.objects.filter(follower=self.user, following=user_to_unfollow).delete()
             
-            # Update points
-            profile.points = max(0, profile.points - 5)
-            profile.save()
+            if deleted:
+                # Update points
+                award_points(user_to_unfollow.id, -FOLLOW_POINTS)
             
             return {
                 'status': 'success',
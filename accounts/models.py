@@ -24,6 +24,28 @@ class Profile(models.Model):
     def __str__(self):
         return f'{self.user.username} Profile'
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored picture so a routine save can be told apart from an avatar change
+        instance._stored_picture = dict(zip(field_names, values)).get('profile_picture') or ''
+        return instance
+    
+    def save(self, *args, **kwargs):
+        self.picture_changed = (
+            self._state.adding
+            or (self.profile_picture.name or '') != getattr(self, '_stored_picture', '')
+        )
+        # Points only change through accounts.points.award_points; leave the
+        # column out of ordinary saves so a stale instance cannot overwrite it
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'points'
+            ]
+        super().save(*args, **kwargs)
+        self._stored_picture = self.profile_picture.name or ''
+    
     @property
     def followers_count(self):
         return self.followers.count()
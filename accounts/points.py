@@ -0,0 +1,30 @@
+from django.db.models import F
+from django.db.models.functions import Greatest
+from .models import Profile
+
+
+# Points awarded for each kind of activity
+POST_POINTS = 10
+COMMENT_POINTS = 3
+LIKE_POINTS = 2
+FOLLOW_POINTS = 5
+
+
+def award_points(user_id, points):
+    """
+    Add ``points`` (negative to deduct) to a user's score.
+    
+    The profile is changed with a single ``UPDATE ... SET points = points + N``
+    that never drops below zero, so concurrent HTTP and WebSocket awards for
+    the same user cannot overwrite one another and no other profile column is
+    rewritten. The leaderboard and the cached sidebar are updated to match.
+    """
+    if not points:
+        return
+    
+    Profile.objects.filter(user_id=user_id).update(points=Greatest(F('points') + points, 0))
+    
+    from blog import leaderboard
+    from blog.context_processors import invalidate_sidebar
+    leaderboard.record(user_id, points=points)
+    invalidate_sidebar()
@@ -1,6 +1,7 @@
 from django.test import TestCase
 from django.contrib.auth.models import User
 from .models import Profile, Follow
+from .points import award_points
 
 
 class ProfileModelTest(TestCase):
@@ -44,4 +45,26 @@ class FollowModelTest(TestCase):
     def test_unique_follow(self):
         # Trying to create the same follow relationship should raise an exception
         with self.assertRaises(Exception):
-            Follow.objects.create(follower=self.user1, following=self.user2)
\ No newline at end of file
+            Follow.objects.create(follower=self.user1, following=self.user2)
+
+
+class AwardPointsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+    
+    def test_award_and_deduct(self):
+        award_points(self.user.id, 10)
+        award_points(self.user.id, 3)
+        self.assertEqual(Profile.objects.get(user=self.user).points, 13)
+        
+        award_points(self.user.id, -20)
+        self.assertEqual(Profile.objects.get(user=self.user).points, 0)
+    
+    def test_stale_instance_does_not_lose_updates(self):
+        stale = Profile.objects.get(user=self.user)
+        award_points(self.user.id, 5)
+        award_points(self.user.id, 5)
+        
+        stale.bio = 'Updated bio'
+        stale.save()
+        self.assertEqual(Profile.objects.get(user=self.user).points, 10)
@@ -1,12 +1,15 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.views.decorators.http import require_POST
 from django.db.models import Count, Q
 from .forms import CustomUserCreationForm, ProfileForm
 from .models import Profile, Follow
+from .points import award_points, FOLLOW_POINTS
+from storyverse.decorators import aget_user
 
 
 
@@ -22,26 +25,32 @@ def register(request):
     return render(request, 'accounts/register.html', {'form': form})
 
 
-def profile_view(request, username):
-    user = get_object_or_404(User, username=username)
-    profile = get_object_or_404(Profile, user=user)
+async def profile_view(request, username):
+    viewer = await aget_user(request)
+    try:
+        profile = await Profile.objects.select_related('user').aget(user__username=username)
+    except Profile.DoesNotExist:
+        raise Http404('No Profile matches the given query.')
+    user = profile.user
     
     # Get user's posts
     from blog.models import Post
-    posts = Post.objects.filter(author=user).order_by('-created_at')
+    posts = [post async for post in Post.objects.filter(author=user).select_related('category').order_by('-created_at')]
     
     # Check if current user is following this profile
     is_following = False
-    if request.user.is_authenticated and request.user != user:
-        is_following = Follow.objects.filter(follower=request.user, following=user).exists()
+    if viewer.is_authenticated and viewer != user:
+        is_following = await Follow.objects.filter(follower=viewer, following=user).aexists()
     
     context = {
         'profile_user': user,
         'profile': profile,
         'posts': posts,
+        'followers_count': await Follow.objects.filter(following=user).acount(),
+        'following_count': await Follow.objects.filter(follower=user).acount(),
         'is_following': is_following,
     }
-    return render(request, 'accounts/profile.html', context)
+    return await sync_to_async(render)(request, 'accounts/profile.html', context)
 
 
 @login_required
@@ -93,17 +102,11 @@ def follow_user(request):
         
         if created:
             # Update points
-            profile.points += 5
-            profile.save()
+            award_points(user_to_follow.id, FOLLOW_POINTS)
             
             # Create notification
-            from notifications.models import Notification
-            Notification.objects.create(
-                recipient=user_to_follow,
-                sender=request.user,
-                notification_type='follow',
-                text=f'{request.user.username} started following you'
-            )
+            from notifications.aggregation import create_notification
+            create_notification(user_to_follow, request.user, 'follow')
             
             return JsonResponse({
                 'status': 'success',
@@ -135,8 +138,7 @@ def unfollow_user(request):
         
         if deleted:
             # Update points
-            profile.points = max(0, profile.points - 5)
-            profile.save()
+            award_points(user_to_unfollow.id, -FOLLOW_POINTS)
             
             return JsonResponse({
                 'status': 'success',
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Post, Category, Subcategory, Comment, Like
+from .models import Post, Category, Subcategory, Comment, Like, LeaderboardEntry
 
 
 @admin.register(Category)
@@ -19,10 +19,10 @@ class SubcategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
-    list_display = ('title', 'author', 'category', 'subcategory', 'created_at', 'is_published')
+    list_display = ('title', 'author', 'category', 'subcategory', 'created_at', 'is_published', 'like_count', 'comment_count')
     list_filter = ('is_published', 'category', 'subcategory', 'created_at')
     search_fields = ('title', 'content', 'author__username')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('created_at', 'updated_at', 'like_count', 'comment_count')
     
     def save_model(self, request, obj, form, change):
         if not change:  # Only on creation
@@ -43,4 +43,10 @@ class LikeAdmin(admin.ModelAdmin):
     list_display = ('post', 'user', 'created_at')
     list_filter = ('created_at',)
     search_fields = ('post__title', 'user__username')
-    readonly_fields = ('created_at',)
\ No newline at end of file
+    readonly_fields = ('created_at',)
+
+@admin.register(LeaderboardEntry)
+class LeaderboardEntryAdmin(admin.ModelAdmin):
+    list_display = ('user', 'window', 'period_start', 'points', 'post_count', 'comment_count')
+    list_filter = ('window', 'period_start')
+    search_fields = ('user__username',)
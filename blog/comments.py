@@ -0,0 +1,78 @@
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+from storyverse.pagination import encode_cursor, paginate_by_cursor
+from .models import Comment
+
+
+THREADS_PER_PAGE = 20
+REPLIES_PER_THREAD = 3
+REPLIES_PER_PAGE = 20
+
+
+def comment_queryset(queryset):
+    return queryset.select_related('author__profile')
+
+
+def load_comment_threads(post, cursor=None, per_page=THREADS_PER_PAGE, replies_per_thread=REPLIES_PER_THREAD):
+    """
+    Load one page of top-level comments on ``post`` with the first few replies of each.
+    
+    Runs two queries whatever the size of the thread: the page of top-level
+    comments, then the leading replies of every thread on the page (ranked
+    per thread with a window function, which also yields each thread's
+    reply total). Each returned comment carries ``thread_replies``,
+    ``reply_count`` and ``replies_cursor`` (``None`` when every reply is
+    already loaded).
+    """
+    page = paginate_by_cursor(
+        comment_queryset(post.comments.filter(parent__isnull=True)), cursor, per_page, descending=False
+    )
+    threads = {comment.id: comment for comment in page}
+    for comment in threads.values():
+        comment.thread_replies = []
+        comment.reply_count = 0
+        comment.replies_cursor = None
+    
+    if threads and replies_per_thread:
+        replies = comment_queryset(Comment.objects.filter(parent_id__in=threads)).annotate(
+            position=Window(RowNumber(), partition_by=[F('parent_id')], order_by=[F('created_at').asc(), F('id').asc()]),
+            thread_total=Window(Count('id'), partition_by=[F('parent_id')]),
+        ).filter(position__lte=replies_per_thread).order_by('parent_id', 'position')
+        
+        for reply in replies:
+            thread = threads[reply.parent_id]
+            thread.thread_replies.append(reply)
+            thread.reply_count = reply.thread_total
+        
+        for thread in threads.values():
+            if thread.reply_count > len(thread.thread_replies):
+                last = thread.thread_replies[-1]
+                thread.replies_cursor = encode_cursor(last.created_at, last.pk)
+    
+    return page
+
+
+def load_replies(comment, cursor=None, per_page=REPLIES_PER_PAGE):
+    """Load the next page of replies to ``comment``, oldest first."""
+    return paginate_by_cursor(comment_queryset(comment.replies.all()), cursor, per_page, descending=False)
+
+
+def serialize_comment(comment):
+    profile = comment.author.profile
+    return {
+        'id': comment.id,
+        'author': comment.author.username,
+        'author_id': comment.author_id,
+        'content': comment.content,
+        'created_at': comment.created_at.strftime('%B %d, %Y, %I:%M %p'),
+        'parent_id': comment.parent_id,
+        'avatar': profile.profile_picture.url if profile.profile_picture else None,
+    }
+
+
+def serialize_thread(comment):
+    data = serialize_comment(comment)
+    data['replies'] = [serialize_comment(reply) for reply in comment.thread_replies]
+    data['reply_count'] = comment.reply_count
+    data['replies_cursor'] = comment.replies_cursor
+    return data
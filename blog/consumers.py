@@ -1,8 +1,10 @@
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.db import transaction
 from django.contrib.auth.models import User
 from .models import Post, Comment, Like
+from accounts.points import award_points, COMMENT_POINTS, LIKE_POINTS
 
 
 class CommentConsumer(AsyncWebsocketConsumer):
@@ -58,37 +60,25 @@ class CommentConsumer(AsyncWebsocketConsumer):
             post = Post.objects.get(id=post_id)
             author = self.scope["user"]
             
-            if parent_id:
-                parent = Comment.objects.get(id=parent_id)
-                comment = Comment.objects.create(post=post, author=author, content=content, parent=parent)
+            with transaction.atomic():
+                if parent_id:
+                    parent = Comment.objects.get(id=parent_id)
+                    comment = Comment.objects.create(post=post, author=author, content=content, parent=parent)
+                    
+                    # Create notification for reply
+                    if parent.author != author:
+                        from notifications.aggregation import create_notification
+                        create_notification(parent.author, author, 'reply', comment.id)
+                else:
+                    comment = Comment.objects.create(post=post, author=author, content=content)
+                    
+                    # Create notification for comment
+                    if post.author != author:
+                        from notifications.aggregation import create_notification
+                        create_notification(post.author, author, 'comment', post.id)
                 
-                # Create notification for reply
-                if parent.author != author:
-                    from notifications.models import Notification
-                    Notification.objects.create(
-                        recipient=parent.author,
-                        sender=author,
-                        notification_type='reply',
-                        text=f'{author.username} replied to your comment',
-                        related_object_id=comment.id
-                    )
-            else:
-                comment = Comment.objects.create(post=post, author=author, content=content)
-                
-                # Create notification for comment
-                if post.author != author:
-                    from notifications.models import Notification
-                    Notification.objects.create(
-                        recipient=post.author,
-                        sender=author,
-                        notification_type='comment',
-                        text=f'{author.username} commented on your post',
-                        related_object_id=comment.id
-                    )
-            
-            # Update points
-            author.profile.points += 3
-            author.profile.save()
+                # Update points
+                award_points(author.id, COMMENT_POINTS)
             
             return {
                 'id': comment.id,
@@ -131,33 +121,27 @@ class LikeConsumer(AsyncWebsocketConsumer):
         try:
             post = Post.objects.get(id=post_id)
             like, created = Like.objects.get_or_create(post=post, user=self.user)
+            post.refresh_from_db(fields=['like_count'])
             
             if created:
                 # Update points
-                post.author.profile.points += 2
-                post.author.profile.save()
+                award_points(post.author_id, LIKE_POINTS)
                 
                 # Create notification
                 if post.author != self.user:
-                    from notifications.models import Notification
-                    Notification.objects.create(
-                        recipient=post.author,
-                        sender=self.user,
-                        notification_type='like',
-                        text=f'{self.user.username} liked your post',
-                        related_object_id=post.id
-                    )
+                    from notifications.aggregation import create_notification
+                    create_notification(post.author, self.user, 'like', post.id)
                 
                 return {
                     'status': 'success',
                     'message': 'You liked this post',
-                    'likes_count': post.likes.count()
+                    'likes_count': post.like_count
                 }
             else:
                 return {
                     'status': 'info',
                     'message': 'You already liked this post',
-                    'likes_count': post.likes.count()
+                    'likes_count': post.like_count
                 }
         except Post.DoesNotExist:
             return {'status': 'error', 'message': 'Post not found'}
@@ -169,22 +153,22 @@ class LikeConsumer(AsyncWebsocketConsumer):
         try:
             post = Post.objects.get(id=post_id)
             deleted, _ = Like.objects.filter(post=post, user=self.user).delete()
+            post.refresh_from_db(fields=['like_count'])
             
             if deleted:
                 # Update points
-                post.author.profile.points = max(0, post.author.profile.points - 2)
-                post.author.profile.save()
+                award_points(post.author_id, -LIKE_POINTS)
                 
                 return {
                     'status': 'success',
                     'message': 'You unliked this post',
-                    'likes_count': post.likes.count()
+                    'likes_count': post.like_count
                 }
             else:
                 return {
                     'status': 'info',
                     'message': 'You did not like this post',
-                    'likes_count': post.likes.count()
+                    'likes_count': post.like_count
                 }
         except Post.DoesNotExist:
             return {'status': 'error', 'message': 'Post not found'}
@@ -0,0 +1,59 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from accounts.models import Profile
+from .models import Category
+
+
+SIDEBAR_CACHE_KEY = 'blog:sidebar'
+SIDEBAR_CACHE_TIMEOUT = 60 * 10
+SIDEBAR_TOP_USERS = 5
+
+
+def get_sidebar_data():
+    """
+    Return the categories (with published post counts) and top users shown in the sidebar.
+    
+    Built with two queries on a cache miss; the cache is dropped by
+    ``invalidate_sidebar`` whenever posts, categories, points or a shown
+    username or avatar change.
+    """
+    data = cache.get(SIDEBAR_CACHE_KEY)
+    if data is None:
+        categories = list(
+            Category.objects.annotate(
+                post_count=Count('post', filter=Q(post__is_published=True))
+            ).order_by('name').values('id', 'name', 'post_count')
+        )
+        
+        top_users = []
+        for profile in Profile.objects.select_related('user').order_by('-points', 'user_id')[:SIDEBAR_TOP_USERS]:
+            top_users.append({
+                'username': profile.user.username,
+                'points': profile.points,
+                'avatar': profile.profile_picture.url if profile.profile_picture else None,
+            })
+        
+        data = {'categories': categories, 'top_users': top_users}
+        cache.set(SIDEBAR_CACHE_KEY, data, SIDEBAR_CACHE_TIMEOUT)
+    return data
+
+
+def invalidate_sidebar():
+    # Dropped once the writer commits, so a concurrent request cannot re-cache the old data
+    transaction.on_commit(lambda: cache.delete(SIDEBAR_CACHE_KEY))
+
+
+def category_post_count(category_id):
+    for category in get_sidebar_data()['categories']:
+        if category['id'] == category_id:
+            return category['post_count']
+    return 0
+
+
+def sidebar(request):
+    data = get_sidebar_data()
+    return {
+        'sidebar_categories': data['categories'],
+        'sidebar_top_users': data['top_users'],
+    }
@@ -0,0 +1,71 @@
+from django.utils.text import Truncator
+from storyverse.pagination import apaginate_by_cursor, paginate_by_cursor
+from .models import Like
+
+
+FEED_PAGE_SIZE = 10
+
+
+def feed_queryset(queryset):
+    """Join every row a post card renders so the template never lazy-loads."""
+    return queryset.select_related('author__profile', 'category', 'subcategory')
+
+
+def liked_post_ids(user, posts):
+    """Return the ids of ``posts`` that ``user`` has liked, in a single query."""
+    if not user.is_authenticated:
+        return set()
+    
+    post_ids = [post.id for post in posts]
+    if not post_ids:
+        return set()
+    
+    return set(Like.objects.filter(user=user, post_id__in=post_ids).values_list('post_id', flat=True))
+
+
+async def aliked_post_ids(user, posts):
+    """Async version of ``liked_post_ids``."""
+    if not user.is_authenticated:
+        return set()
+    
+    post_ids = [post.id for post in posts]
+    if not post_ids:
+        return set()
+    
+    return {post_id async for post_id in Like.objects.filter(user=user, post_id__in=post_ids).values_list('post_id', flat=True)}
+
+
+def load_feed_page(request, queryset, per_page=FEED_PAGE_SIZE):
+    """
+    Fetch one page of ``queryset`` for a listing view, keyed on the ``cursor`` query parameter.
+    
+    Returns the page and the set of post ids on it that the viewer has liked.
+    """
+    page_obj = paginate_by_cursor(feed_queryset(queryset), request.GET.get('cursor'), per_page)
+    return page_obj, liked_post_ids(request.user, page_obj)
+
+
+async def aload_feed_page(request, queryset, per_page=FEED_PAGE_SIZE):
+    """Async version of ``load_feed_page``; ``request.user`` must already be resolved."""
+    page_obj = await apaginate_by_cursor(feed_queryset(queryset), request.GET.get('cursor'), per_page)
+    return page_obj, await aliked_post_ids(request.user, page_obj)
+
+
+def serialize_post(post, liked_ids):
+    profile = post.author.profile
+    return {
+        'id': post.id,
+        'title': post.title,
+        'url': post.get_absolute_url(),
+        'excerpt': Truncator(post.content).words(50),
+        'cover_image': post.cover_image.url if post.cover_image else None,
+        'author': post.author.username,
+        'author_avatar': profile.profile_picture.url if profile.profile_picture else None,
+        'category': post.category.name if post.category else None,
+        'subcategory_id': post.subcategory_id,
+        'subcategory': post.subcategory.name if post.subcategory else None,
+        'created_at': post.created_at.strftime('%B %d, %Y'),
+        'likes_count': post.likes_count,
+        'comments_count': post.comments_count,
+        'liked': post.id in liked_ids,
+    }
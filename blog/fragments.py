@@ -0,0 +1,111 @@
+import time
+from django.core.cache import cache
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+
+FRAGMENT_CACHE_TIMEOUT = 60 * 60
+POST_VERSION_TIMEOUT = 60 * 60 * 24
+
+# Placeholders rendered into cached cards in place of the viewer's like state
+LIKED_MARKERS = {
+    'css': '__liked_css__',
+    'state': '__liked_state__',
+    'icon': '__liked_icon__',
+}
+LIKED = {'css': 'text-red-500 dark:text-red-400', 'state': 'true', 'icon': 'fas'}
+NOT_LIKED = {'css': '', 'state': 'false', 'icon': 'far'}
+
+
+def _version_key(kind, object_id):
+    return f'blog:{kind}:{object_id}:version'
+
+
+def _new_version():
+    # Seeded from the clock so a version evicted from the cache never reuses an old fragment
+    return int(time.time() * 1000)
+
+
+def _version_parts(post):
+    # Everything a cached fragment shows about the post: its own fields, the author's
+    # username and avatar, and the category/subcategory names
+    parts = [('post', post.id), ('author', post.author_id)]
+    if post.category_id:
+        parts.append(('category', post.category_id))
+    if post.subcategory_id:
+        parts.append(('subcategory', post.subcategory_id))
+    return [_version_key(kind, object_id) for kind, object_id in parts]
+
+
+def post_versions(posts):
+    """Return ``{post_id: version}`` for ``posts`` with a single cache round trip."""
+    parts = {post.id: _version_parts(post) for post in posts}
+    keys = {key for post_keys in parts.values() for key in post_keys}
+    versions = cache.get_many(keys)
+    
+    missing = {key: _new_version() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, POST_VERSION_TIMEOUT)
+        versions.update(missing)
+    return {
+        post_id: '.'.join(str(versions[key]) for key in post_keys)
+        for post_id, post_keys in parts.items()
+    }
+
+
+def post_version(post):
+    return post_versions([post])[post.id]
+
+
+def bump_version(kind, object_id):
+    """Invalidate every cached fragment that shows this object by moving it to a new version."""
+    key = _version_key(kind, object_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), POST_VERSION_TIMEOUT)
+
+
+def bump_version_on_commit(kind, object_id):
+    # Bumping before the writer commits would let a concurrent request re-cache the old row
+    # under the new version
+    transaction.on_commit(lambda: bump_version(kind, object_id))
+
+
+def splice_liked(html, liked):
+    for name, marker in LIKED_MARKERS.items():
+        html = html.replace(marker, (LIKED if liked else NOT_LIKED)[name])
+    return html
+
+
+def render_post_cards(posts, liked_ids, is_authenticated):
+    """
+    Render feed cards for ``posts``, reusing cached fragments where the post is unchanged.
+    
+    Cards are cached per version of the post, its author and its categories, and per
+    anonymous/authenticated variant, with the like state left as markers that are
+    filled in for this viewer.
+    """
+    posts = list(posts)
+    versions = post_versions(posts)
+    variant = 'auth' if is_authenticated else 'anon'
+    keys = {post.id: f'blog:post_card:{post.id}:{versions[post.id]}:{variant}' for post in posts}
+    cached = cache.get_many(keys.values())
+    
+    rendered = {}
+    cards = []
+    for post in posts:
+        html = cached.get(keys[post.id])
+        if html is None:
+            html = render_to_string('blog/_post_card.html', {
+                'post': post,
+                'is_authenticated': is_authenticated,
+                'liked': LIKED_MARKERS,
+            })
+            rendered[keys[post.id]] = html
+        cards.append(splice_liked(html, post.id in liked_ids))
+    
+    if rendered:
+        cache.set_many(rendered, FRAGMENT_CACHE_TIMEOUT)
+    return mark_safe(''.join(cards))
@@ -0,0 +1,81 @@
+from datetime import date, timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .models import LeaderboardEntry
+
+
+WINDOWS = ('daily', 'weekly', 'all')
+DEFAULT_WINDOW = 'all'
+ALL_TIME_START = date(1970, 1, 1)
+
+
+def period_start(window, when=None):
+    """Return the first day of the ``window`` period containing ``when`` (default: now)."""
+    day = timezone.localdate(when) if when else timezone.localdate()
+    if window == 'daily':
+        return day
+    if window == 'weekly':
+        return day - timedelta(days=day.weekday())
+    return ALL_TIME_START
+
+
+def record(user_id, points=0, posts=0, comments=0, when=None):
+    """
+    Add to a user's score in every window that ``when`` falls in.
+    
+    Each window is one ``F()`` UPDATE on its ranking row; the row is created
+    the first time a user gains anything in that period. Decrements stop at
+    zero and never create rows, so removing content from an expired period
+    is a no-op.
+    """
+    if not (points or posts or comments):
+        return
+    
+    for window in WINDOWS:
+        lookup = {'user_id': user_id, 'window': window, 'period_start': period_start(window, when)}
+        changes = {
+            'points': Greatest(F('points') + points, 0),
+            'post_count': Greatest(F('post_count') + posts, 0),
+            'comment_count': Greatest(F('comment_count') + comments, 0),
+        }
+        if LeaderboardEntry.objects.filter(**lookup).update(**changes):
+            continue
+        if points < 0 or posts < 0 or comments < 0:
+            continue
+        
+        try:
+            with transaction.atomic():
+                LeaderboardEntry.objects.create(points=points, post_count=posts, comment_count=comments, **lookup)
+        except IntegrityError:
+            # Another writer created the row first
+            LeaderboardEntry.objects.filter(**lookup).update(**changes)
+
+
+def _window_entries(window):
+    return LeaderboardEntry.objects.filter(window=window, period_start=period_start(window))
+
+
+def top(window=DEFAULT_WINDOW, limit=20):
+    """Return the top ``limit`` entries of the current ``window`` period, read straight off the rank index."""
+    return list(
+        _window_entries(window).select_related('user__profile').order_by('-points', 'user_id')[:limit]
+    )
+
+
+def rank_of(user, window=DEFAULT_WINDOW):
+    """
+    Return ``(rank, entry)`` for ``user`` in the current ``window`` period, or ``(None, None)``.
+    
+    The rank is one more than the number of entries ordered ahead of it,
+    counted as a range scan on the rank index.
+    """
+    entry = _window_entries(window).filter(user=user).first()
+    if entry is None:
+        return None, None
+    
+    ahead = _window_entries(window).filter(
+        Q(points__gt=entry.points) | Q(points=entry.points, user_id__lt=entry.user_id)
+    ).count()
+    return ahead + 1, entry
@@ -0,0 +1,56 @@
+from collections import defaultdict
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from accounts.models import Profile, Follow
+from accounts.points import POST_POINTS, COMMENT_POINTS, LIKE_POINTS, FOLLOW_POINTS
+from blog.leaderboard import WINDOWS, period_start
+from blog.models import Post, Comment, Like, LeaderboardEntry
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the leaderboard rankings for the current period of every window and drop expired periods'
+    
+    def tally(self, window):
+        start = period_start(window)
+        totals = defaultdict(lambda: {'points': 0, 'post_count': 0, 'comment_count': 0})
+        
+        posts = Post.objects.filter(is_published=True)
+        comments = Comment.objects.all()
+        if window == 'all':
+            for user_id, points in Profile.objects.filter(points__gt=0).values_list('user_id', 'points'):
+                totals[user_id]['points'] = points
+        else:
+            since = timezone.make_aware(datetime.combine(start, time.min))
+            posts = posts.filter(created_at__gte=since)
+            comments = comments.filter(created_at__gte=since)
+            awards = [
+                (posts, 'author', POST_POINTS),
+                (comments, 'author', COMMENT_POINTS),
+                (Like.objects.filter(created_at__gte=since), 'post__author', LIKE_POINTS),
+                (Follow.objects.filter(created_at__gte=since), 'following', FOLLOW_POINTS),
+            ]
+            for queryset, user_field, points in awards:
+                for row in queryset.order_by().values(user_field).annotate(total=Count('id')):
+                    totals[row[user_field]]['points'] += row['total'] * points
+        
+        for field, queryset in (('post_count', posts), ('comment_count', comments)):
+            for row in queryset.order_by().values('author').annotate(total=Count('id')):
+                totals[row['author']][field] = row['total']
+        
+        return [
+            LeaderboardEntry(user_id=user_id, window=window, period_start=start, **values)
+            for user_id, values in totals.items()
+        ]
+    
+    def handle(self, *args, **options):
+        for window in WINDOWS:
+            entries = self.tally(window)
+            with transaction.atomic():
+                LeaderboardEntry.objects.filter(window=window).delete()
+                LeaderboardEntry.objects.bulk_create(entries, batch_size=500)
+            
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {window} leaderboard ({len(entries)} user(s))'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from blog.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for published posts from scratch'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database alias to rebuild the index on')
+    
+    def handle(self, *args, **options):
+        using = options['database']
+        vendor = connections[using].vendor
+        
+        with transaction.atomic(using=using):
+            indexed = rebuild_search_index(using)
+        
+        if vendor not in ('sqlite', 'postgresql'):
+            self.stdout.write(self.style.WARNING(f'No full-text index for the {vendor} backend; search falls back to substring matching'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} post(s)'))
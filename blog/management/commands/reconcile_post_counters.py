@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from blog.models import Post, Comment, Like
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored like and comment counters on every post'
+    
+    def handle(self, *args, **options):
+        likes = Like.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(
+            total=Count('id')
+        ).values('total')
+        comments = Comment.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(
+            total=Count('id')
+        ).values('total')
+        
+        with transaction.atomic():
+            drifted = Post.objects.exclude(
+                like_count=Coalesce(Subquery(likes, output_field=IntegerField()), 0),
+                comment_count=Coalesce(Subquery(comments, output_field=IntegerField()), 0),
+            ).count()
+            Post.objects.update(
+                like_count=Coalesce(Subquery(likes, output_field=IntegerField()), 0),
+                comment_count=Coalesce(Subquery(comments, output_field=IntegerField()), 0),
+            )
+        
+        self.stdout.write(self.style.SUCCESS(f'Reconciled counters ({drifted} post(s) had drifted)'))
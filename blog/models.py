@@ -1,4 +1,7 @@
 from django.db import models
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.contrib.auth.models import User
 from django.urls import reverse
 import os
@@ -42,23 +45,51 @@ class Post(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_published = models.BooleanField(default=True)
+    like_count = models.PositiveIntegerField(default=0, editable=False)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination on (created_at, id) for every feed listing
+            models.Index(fields=['is_published', '-created_at', '-id'], name='blog_post_feed_idx'),
+            models.Index(fields=['category', 'is_published', '-created_at', '-id'], name='blog_post_category_feed_idx'),
+            models.Index(fields=['subcategory', 'is_published', '-created_at', '-id'], name='blog_post_subcat_feed_idx'),
+        ]
     
     def __str__(self):
         return self.title
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored state so receivers can tell when a post is published or withdrawn
+        if 'is_published' in field_names:
+            instance._stored_is_published = values[field_names.index('is_published')]
+        return instance
+    
+    def save(self, *args, **kwargs):
+        self.was_published = False if self._state.adding else getattr(self, '_stored_is_published', self.is_published)
+        # The counters only change through adjust_post_counter's F() updates; leave
+        # them out of ordinary saves so a stale instance cannot overwrite them
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in ('like_count', 'comment_count')
+            ]
+        super().save(*args, **kwargs)
+        self._stored_is_published = self.is_published
+    
     def get_absolute_url(self):
-        return reverse('post_detail', kwargs={'pk': self.pk})
+        return reverse('blog:post_detail', kwargs={'pk': self.pk})
     
     @property
     def comments_count(self):
-        return self.comments.count()
+        return self.comment_count
     
     @property
     def likes_count(self):
-        return self.likes.count()
+        return self.like_count
 
 
 class Comment(models.Model):
@@ -88,4 +119,169 @@ class Like(models.Model):
         unique_together = ('post', 'user')
     
     def __str__(self):
-        return f'{self.user.username} likes {self.post.title}'
\ No newline at end of file
+        return f'{self.user.username} likes {self.post.title}'
+
+
+class LeaderboardEntry(models.Model):
+    WINDOW_CHOICES = (
+        ('daily', 'Today'),
+        ('weekly', 'This week'),
+        ('all', 'All time'),
+    )
+    
+    user = models.ForeignKey(User, related_name='leaderboard_entries', on_delete=models.CASCADE)
+    window = models.CharField(max_length=10, choices=WINDOW_CHOICES)
+    period_start = models.DateField()
+    points = models.IntegerField(default=0)
+    post_count = models.IntegerField(default=0)
+    comment_count = models.IntegerField(default=0)
+    
+    class Meta:
+        verbose_name_plural = "Leaderboard entries"
+        unique_together = ('user', 'window', 'period_start')
+        indexes = [
+            models.Index(fields=['window', 'period_start', '-points', 'user'], name='blog_leaderboard_rank_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.user.username}: {self.points} points ({self.window} from {self.period_start})'
+
+
+@receiver(post_save, sender=Post)
+def update_search_index(sender, instance, using, **kwargs):
+    from .search import index_post
+    index_post(instance, using)
+
+
+@receiver(post_delete, sender=Post)
+def remove_from_search_index(sender, instance, using, **kwargs):
+    from .search import remove_post
+    remove_post(instance.pk, using)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def refresh_sidebar(sender, **kwargs):
+    from .context_processors import invalidate_sidebar
+    invalidate_sidebar()
+
+
+@receiver(post_save, sender=User)
+def refresh_sidebar_username(sender, instance, created, update_fields=None, **kwargs):
+    if not created and (update_fields is None or 'username' in update_fields):
+        from .context_processors import invalidate_sidebar
+        invalidate_sidebar()
+
+
+@receiver(post_save, sender='accounts.Profile')
+def refresh_sidebar_avatar(sender, instance, **kwargs):
+    # Points change through award_points, which invalidates on its own; every login
+    # saves the profile too, so only an avatar change counts here
+    if instance.picture_changed:
+        from .context_processors import invalidate_sidebar
+        invalidate_sidebar()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def refresh_post_fragments(sender, instance, **kwargs):
+    from .fragments import bump_version_on_commit
+    bump_version_on_commit('post', instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Like)
+@receiver(post_delete, sender=Like)
+def refresh_parent_post_fragments(sender, instance, **kwargs):
+    from .fragments import bump_version_on_commit
+    bump_version_on_commit('post', instance.post_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def refresh_category_fragments(sender, instance, **kwargs):
+    from .fragments import bump_version_on_commit
+    bump_version_on_commit('category', instance.pk)
+
+
+@receiver(post_save, sender=Subcategory)
+@receiver(post_delete, sender=Subcategory)
+def refresh_subcategory_fragments(sender, instance, **kwargs):
+    from .fragments import bump_version_on_commit
+    bump_version_on_commit('subcategory', instance.pk)
+
+
+@receiver(post_save, sender=User)
+def refresh_author_fragments(sender, instance, created, update_fields=None, **kwargs):
+    # Logins save the user with update_fields=['last_login']; only a username change shows up in fragments
+    if not created and (update_fields is None or 'username' in update_fields):
+        from .fragments import bump_version_on_commit
+        bump_version_on_commit('author', instance.pk)
+
+
+@receiver(post_save, sender='accounts.Profile')
+def refresh_author_avatar_fragments(sender, instance, created, **kwargs):
+    if not created and instance.picture_changed:
+        from .fragments import bump_version_on_commit
+        bump_version_on_commit('author', instance.user_id)
+
+
+@receiver(post_save, sender=Post)
+def count_post_on_leaderboard(sender, instance, **kwargs):
+    # Counted when first published, on creation or later, and uncounted when withdrawn
+    if instance.is_published != instance.was_published:
+        from .leaderboard import record
+        record(instance.author_id, posts=1 if instance.is_published else -1, when=instance.created_at)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post_on_leaderboard(sender, instance, **kwargs):
+    if instance.is_published:
+        from .leaderboard import record
+        record(instance.author_id, posts=-1, when=instance.created_at)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment_on_leaderboard(sender, instance, created, **kwargs):
+    if created:
+        from .leaderboard import record
+        record(instance.author_id, comments=1, when=instance.created_at)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment_on_leaderboard(sender, instance, **kwargs):
+    from .leaderboard import record
+    record(instance.author_id, comments=-1, when=instance.created_at)
+
+
+def adjust_post_counter(post_id, field, delta):
+    # Single UPDATE with an F() expression so concurrent writers never lose an increment
+    if delta < 0:
+        Post.objects.filter(pk=post_id, **{f'{field}__gt': 0}).update(**{field: F(field) + delta})
+    else:
+        Post.objects.filter(pk=post_id).update(**{field: F(field) + delta})
+
+
+@receiver(post_save, sender=Comment)
+def increment_comment_count(sender, instance, created, **kwargs):
+    if created:
+        adjust_post_counter(instance.post_id, 'comment_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comment_count(sender, instance, **kwargs):
+    adjust_post_counter(instance.post_id, 'comment_count', -1)
+
+
+@receiver(post_save, sender=Like)
+def increment_like_count(sender, instance, created, **kwargs):
+    if created:
+        adjust_post_counter(instance.post_id, 'like_count', 1)
+
+
+@receiver(post_delete, sender=Like)
+def decrement_like_count(sender, instance, **kwargs):
+    adjust_post_counter(instance.post_id, 'like_count', -1)
@@ -0,0 +1,193 @@
+import re
+from django.contrib.auth.models import User
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.db.models import Q
+from .models import Post
+from .feed import feed_queryset
+
+
+SEARCH_TABLE = 'blog_post_search'
+
+# Column weights: a hit in the title outranks one in the author name, which outranks the body
+TITLE_WEIGHT, CONTENT_WEIGHT, AUTHOR_WEIGHT = 10.0, 1.0, 5.0
+
+# PostgreSQL: one text search config for indexing and querying, so both sides stem alike, and
+# the same weights as ts_rank_cd's {D, C, B, A} array for the title (A), author (B) and body (C)
+POSTGRES_SEARCH_CONFIG = 'english'
+POSTGRES_RANK_WEIGHTS = f"'{{0, {CONTENT_WEIGHT / TITLE_WEIGHT}, {AUTHOR_WEIGHT / TITLE_WEIGHT}, 1}}'"
+
+
+def _backend(using=DEFAULT_DB_ALIAS):
+    vendor = connections[using].vendor
+    return vendor if vendor in ('sqlite', 'postgresql') else None
+
+
+def ensure_search_index(using=DEFAULT_DB_ALIAS):
+    """Create the full-text index table if the database supports one."""
+    backend = _backend(using)
+    with connections[using].cursor() as cursor:
+        if backend == 'sqlite':
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} "
+                f"USING fts5(title, content, author, tokenize='porter unicode61')"
+            )
+        elif backend == 'postgresql':
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+                f"post_id bigint PRIMARY KEY REFERENCES {Post._meta.db_table} (id) ON DELETE CASCADE, "
+                f"document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_document_idx ON {SEARCH_TABLE} USING GIN (document)"
+            )
+
+
+def _postgres_document_sql():
+    return (
+        f"setweight(to_tsvector('{POSTGRES_SEARCH_CONFIG}', %s), 'A') || "
+        f"setweight(to_tsvector('{POSTGRES_SEARCH_CONFIG}', %s), 'C') || "
+        f"setweight(to_tsvector('{POSTGRES_SEARCH_CONFIG}', %s), 'B')"
+    )
+
+
+def index_post(post, using=DEFAULT_DB_ALIAS):
+    """Add, refresh or drop a single post's entry so the index tracks ``Post`` writes."""
+    backend = _backend(using)
+    if backend is None:
+        return
+    
+    if not post.is_published:
+        remove_post(post.pk, using)
+        return
+    
+    author = User.objects.using(using).values_list('username', flat=True).get(pk=post.author_id)
+    with connections[using].cursor() as cursor:
+        if backend == 'sqlite':
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [post.pk])
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, title, content, author) VALUES (%s, %s, %s, %s)",
+                [post.pk, post.title, post.content, author]
+            )
+        else:
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} (post_id, document) VALUES (%s, {_postgres_document_sql()}) "
+                f"ON CONFLICT (post_id) DO UPDATE SET document = EXCLUDED.document",
+                [post.pk, post.title, post.content, author]
+            )
+
+
+def remove_post(post_id, using=DEFAULT_DB_ALIAS):
+    backend = _backend(using)
+    if backend is None:
+        return
+    
+    column = 'rowid' if backend == 'sqlite' else 'post_id'
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE {column} = %s", [post_id])
+
+
+def rebuild_search_index(using=DEFAULT_DB_ALIAS):
+    """Drop and repopulate the index from every published post. Returns the number of posts indexed."""
+    backend = _backend(using)
+    if backend is None:
+        return 0
+    
+    post_table = Post._meta.db_table
+    user_table = User._meta.db_table
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+        ensure_search_index(using)
+        
+        if backend == 'sqlite':
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, title, content, author) "
+                f"SELECT p.id, p.title, p.content, u.username FROM {post_table} p "
+                f"JOIN {user_table} u ON u.id = p.author_id WHERE p.is_published"
+            )
+        else:
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} (post_id, document) "
+                f"SELECT p.id, {_postgres_document_sql() % ('p.title', 'p.content', 'u.username')} "
+                f"FROM {post_table} p JOIN {user_table} u ON u.id = p.author_id WHERE p.is_published"
+            )
+        return cursor.rowcount
+
+
+def _fts5_query(query):
+    # Quote every term so user input can never be parsed as FTS5 syntax; match prefixes so partial words hit
+    terms = re.findall(r'\w+', query)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+class SearchResults:
+    """
+    Lazily evaluated, relevance-ranked search hits for ``Paginator``.
+    
+    ``count()`` asks the index for the number of matches and slicing fetches
+    just that window of ranked ids before loading the posts with everything
+    a card needs joined in.
+    """
+    
+    def __init__(self, query, using=DEFAULT_DB_ALIAS):
+        self.query = query
+        self.using = using
+        self.backend = _backend(using)
+        self._count = None
+    
+    def _match(self):
+        if self.backend == 'sqlite':
+            return f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s", [_fts5_query(self.query)]
+        return (
+            f"FROM {SEARCH_TABLE}, websearch_to_tsquery('{POSTGRES_SEARCH_CONFIG}', %s) query WHERE document @@ query",
+            [self.query]
+        )
+    
+    def _fallback_queryset(self):
+        return Post.objects.filter(
+            Q(title__icontains=self.query) |
+            Q(content__icontains=self.query) |
+            Q(author__username__icontains=self.query),
+            is_published=True
+        ).order_by('-created_at')
+    
+    def count(self):
+        if self._count is None:
+            if self.backend is None:
+                self._count = self._fallback_queryset().count()
+            elif self.backend == 'sqlite' and not _fts5_query(self.query):
+                self._count = 0
+            else:
+                where, params = self._match()
+                with connections[self.using].cursor() as cursor:
+                    cursor.execute(f"SELECT COUNT(*) {where}", params)
+                    self._count = cursor.fetchone()[0]
+        return self._count
+    
+    def __len__(self):
+        return self.count()
+    
+    def ranked_ids(self, offset, limit):
+        if self.backend is None:
+            return list(self._fallback_queryset().values_list('id', flat=True)[offset:offset + limit])
+        if self.backend == 'sqlite' and not _fts5_query(self.query):
+            return []
+        
+        where, params = self._match()
+        if self.backend == 'sqlite':
+            select = f"SELECT rowid {where} ORDER BY bm25({SEARCH_TABLE}, {TITLE_WEIGHT}, {CONTENT_WEIGHT}, {AUTHOR_WEIGHT}), rowid DESC"
+        else:
+            select = f"SELECT post_id {where} ORDER BY ts_rank_cd({POSTGRES_RANK_WEIGHTS}, document, query) DESC, post_id DESC"
+        
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f"{select} LIMIT %s OFFSET %s", params + [limit, offset])
+            return [row[0] for row in cursor.fetchall()]
+    
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        
+        offset = key.start or 0
+        limit = (key.stop if key.stop is not None else self.count()) - offset
+        ids = self.ranked_ids(offset, max(limit, 0))
+        posts = feed_queryset(Post.objects.using(self.using).filter(id__in=ids, is_published=True)).in_bulk()
+        return [posts[post_id] for post_id in ids if post_id in posts]
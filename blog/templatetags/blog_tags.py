@@ -0,0 +1,15 @@
+from django import template
+from blog.fragments import render_post_cards
+
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    user = context.get('user')
+    return render_post_cards(
+        posts,
+        context.get('user_liked_posts') or set(),
+        bool(user and user.is_authenticated),
+    )
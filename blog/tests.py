@@ -1,6 +1,19 @@
-from django.test import TestCase
-from django.contrib.auth.models import User
-from .models import Post, Category, Subcategory, Comment, Like
+from io import StringIO
+from django.test import TestCase, RequestFactory
+from django.core.cache import cache
+from django.core.management import call_command
+from django.urls import reverse
+from django.contrib.auth.models import User, AnonymousUser
+from .models import Post, Category, Subcategory, Comment, Like, LeaderboardEntry
+from .forms import PostForm
+from .feed import load_feed_page
+from .search import SearchResults
+from .context_processors import sidebar
+from .comments import load_comment_threads, load_replies
+from .fragments import render_post_cards
+from . import leaderboard
+from storyverse.pagination import paginate_by_cursor
+from accounts.points import award_points
 
 
 class PostModelTest(TestCase):
@@ -36,6 +49,7 @@ class PostModelTest(TestCase):
             content='Test comment'
         )
         
+        self.post.refresh_from_db()
         self.assertEqual(self.post.comments_count, 1)
     
     def test_likes_count(self):
@@ -47,7 +61,42 @@ class PostModelTest(TestCase):
             user=self.user
         )
         
+        self.post.refresh_from_db()
         self.assertEqual(self.post.likes_count, 1)
+    
+    def test_counters_follow_deletes(self):
+        comment = Comment.objects.create(post=self.post, author=self.user, content='Test comment')
+        Comment.objects.create(post=self.post, author=self.user, content='Test reply', parent=comment)
+        Like.objects.create(post=self.post, user=self.user)
+        
+        comment.delete()
+        Like.objects.filter(post=self.post, user=self.user).delete()
+        
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+        self.assertEqual(self.post.likes_count, 0)
+    
+    def test_edit_keeps_counters(self):
+        stale = Post.objects.get(pk=self.post.pk)
+        Like.objects.create(post=self.post, user=self.user)
+        
+        form = PostForm({'title': 'Edited title', 'content': 'Edited content'}, instance=stale)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.title, 'Edited title')
+        self.assertEqual(self.post.likes_count, 1)
+    
+    def test_reconcile_post_counters(self):
+        Comment.objects.create(post=self.post, author=self.user, content='Test comment')
+        Post.objects.filter(pk=self.post.pk).update(comment_count=7, like_count=3)
+        
+        call_command('reconcile_post_counters', stdout=StringIO())
+        
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertEqual(self.post.likes_count, 0)
 
 
 class CommentModelTest(TestCase):
@@ -113,4 +162,376 @@ class LikeModelTest(TestCase):
             Like.objects.create(
                 post=self.post,
                 user=self.user
-            )
\ No newline at end of file
+            )
+
+
+class FeedLoaderTest(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.category = Category.objects.create(name='Test Category')
+        self.subcategory = Subcategory.objects.create(name='Test Subcategory', category=self.category)
+        for i in range(12):
+            post = Post.objects.create(
+                title=f'Post {i}',
+                content='Test content',
+                author=self.user,
+                category=self.category,
+                subcategory=self.subcategory
+            )
+            if i % 2:
+                Like.objects.create(post=post, user=self.user)
+    
+    def render_cards(self, page_obj):
+        # Touch everything a post card in the listing templates touches
+        return [
+            (post.author.username, post.author.profile.points, post.category.name, post.subcategory.name)
+            for post in page_obj
+        ]
+    
+    def test_page_runs_fixed_number_of_queries(self):
+        request = self.factory.get('/')
+        request.user = self.user
+        
+        # The joined page and the viewer's likes
+        with self.assertNumQueries(2):
+            page_obj, liked = load_feed_page(request, Post.objects.filter(is_published=True))
+            self.render_cards(page_obj)
+        
+        self.assertEqual(len(page_obj), 10)
+        expected = set(Like.objects.filter(user=self.user, post__in=page_obj.object_list).values_list('post_id', flat=True))
+        self.assertEqual(liked, expected)
+    
+    def test_anonymous_viewer_has_no_liked_posts(self):
+        first_page, _ = load_feed_page(self.anonymous_request('/'), Post.objects.filter(is_published=True))
+        request = self.anonymous_request('/', {'cursor': first_page.next_cursor})
+        
+        with self.assertNumQueries(1):
+            page_obj, liked = load_feed_page(request, Post.objects.filter(is_published=True))
+            self.render_cards(page_obj)
+        
+        self.assertEqual(len(page_obj), 2)
+        self.assertFalse(page_obj.has_next())
+        self.assertEqual(liked, set())
+    
+    def anonymous_request(self, path, data=None):
+        request = self.factory.get(path, data)
+        request.user = AnonymousUser()
+        return request
+
+
+class CursorPaginationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.posts = [
+            Post.objects.create(title=f'Post {i}', content='Test content', author=self.user)
+            for i in range(7)
+        ]
+        # Give several posts the same timestamp so the id tiebreaker is exercised
+        Post.objects.filter(pk__in=[post.pk for post in self.posts[2:5]]).update(created_at=self.posts[2].created_at)
+    
+    def test_walks_every_post_exactly_once(self):
+        seen = []
+        cursor = None
+        while True:
+            page = paginate_by_cursor(Post.objects.all(), cursor, per_page=3)
+            seen.extend(post.pk for post in page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        
+        expected = list(Post.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+    
+    def test_malformed_cursor_returns_first_page(self):
+        page = paginate_by_cursor(Post.objects.all(), 'not-a-cursor', per_page=3)
+        first = paginate_by_cursor(Post.objects.all(), None, per_page=3)
+        
+        self.assertEqual([post.pk for post in page], [post.pk for post in first])
+        self.assertFalse(page.has_previous())
+    
+    def test_api_feed_returns_next_cursor(self):
+        response = self.client.get(reverse('blog:api_feed'))
+        data = response.json()
+        
+        self.assertEqual(len(data['posts']), 7)
+        self.assertIsNone(data['next_cursor'])
+        self.assertEqual(data['posts'][0]['id'], self.posts[-1].pk)
+        self.assertFalse(data['posts'][0]['liked'])
+
+
+class SearchTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='storyteller', password='testpass')
+        self.other = User.objects.create_user(username='reader', password='testpass')
+        self.body_hit = Post.objects.create(title='Morning notes', content='A walk past the lighthouse at dawn.', author=self.other)
+        self.title_hit = Post.objects.create(title='The lighthouse keeper', content='Stories from the coast.', author=self.other)
+        self.author_hit = Post.objects.create(title='Untitled', content='Nothing to see.', author=self.user)
+        self.draft = Post.objects.create(title='Lighthouse draft', content='Unfinished.', author=self.other, is_published=False)
+    
+    def ids(self, query):
+        results = SearchResults(query)
+        return [post.id for post in results[:results.count()]]
+    
+    def test_ranks_title_matches_first(self):
+        self.assertEqual(self.ids('lighthouse'), [self.title_hit.id, self.body_hit.id])
+    
+    def test_matches_author_and_prefixes(self):
+        self.assertEqual(self.ids('storyteller'), [self.author_hit.id])
+        self.assertEqual(self.ids('lightho'), [self.title_hit.id, self.body_hit.id])
+    
+    def test_index_follows_updates_and_deletes(self):
+        self.title_hit.title = 'The harbour keeper'
+        self.title_hit.save()
+        self.body_hit.delete()
+        
+        self.assertEqual(self.ids('lighthouse'), [])
+        self.assertEqual(self.ids('harbour'), [self.title_hit.id])
+    
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.ids('"lighthouse" (keeper'), [self.title_hit.id])
+        self.assertEqual(SearchResults('***').count(), 0)
+    
+    def test_rebuild_search_index(self):
+        Post.objects.filter(pk=self.draft.pk).update(is_published=True)
+        
+        call_command('rebuild_search_index', stdout=StringIO())
+        
+        self.assertIn(self.draft.id, self.ids('lighthouse'))
+
+
+class SidebarContextProcessorTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.category = Category.objects.create(name='Test Category')
+        Post.objects.create(title='Published', content='Test content', author=self.user, category=self.category)
+        Post.objects.create(title='Draft', content='Test content', author=self.user, category=self.category, is_published=False)
+    
+    def test_warm_cache_adds_no_queries(self):
+        request = self.factory.get('/')
+        sidebar(request)
+        
+        with self.assertNumQueries(0):
+            context = sidebar(request)
+        
+        self.assertEqual(context['sidebar_categories'], [{'id': self.category.id, 'name': 'Test Category', 'post_count': 1}])
+        self.assertEqual(context['sidebar_top_users'][0]['username'], 'testuser')
+    
+    def test_invalidated_by_posts_and_points(self):
+        request = self.factory.get('/')
+        sidebar(request)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(title='Another', content='Test content', author=self.user, category=self.category)
+        self.assertEqual(sidebar(request)['sidebar_categories'][0]['post_count'], 2)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            award_points(self.user.id, 42)
+        self.assertEqual(sidebar(request)['sidebar_top_users'][0]['points'], 42)
+    
+    def test_login_keeps_cache(self):
+        request = self.factory.get('/')
+        sidebar(request)
+        
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.client.login(username='testuser', password='testpass')
+        self.assertEqual(callbacks, [])
+        with self.assertNumQueries(0):
+            sidebar(request)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.username = 'renamed'
+            self.user.save()
+        self.assertEqual(sidebar(request)['sidebar_top_users'][0]['username'], 'renamed')
+
+
+class CommentTreeTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.post = Post.objects.create(title='Test Post', content='Test content', author=self.user)
+        self.threads = [
+            Comment.objects.create(post=self.post, author=self.user, content=f'Comment {i}')
+            for i in range(5)
+        ]
+        self.replies = [
+            Comment.objects.create(post=self.post, author=self.user, content=f'Reply {i}', parent=self.threads[0])
+            for i in range(4)
+        ]
+        Comment.objects.create(post=self.post, author=self.user, content='Only reply', parent=self.threads[1])
+    
+    def test_threads_load_in_two_queries(self):
+        with self.assertNumQueries(2):
+            page = load_comment_threads(self.post, per_page=3, replies_per_thread=2)
+            rendered = [
+                (comment.author.profile.points, [reply.author.profile.points for reply in comment.thread_replies])
+                for comment in page
+            ]
+        
+        self.assertEqual([comment.id for comment in page], [comment.id for comment in self.threads[:3]])
+        self.assertEqual(len(rendered), 3)
+        first, second, third = page
+        self.assertEqual(first.thread_replies, self.replies[:2])
+        self.assertEqual(first.reply_count, 4)
+        self.assertIsNotNone(first.replies_cursor)
+        self.assertEqual(second.reply_count, 1)
+        self.assertIsNone(second.replies_cursor)
+        self.assertEqual(third.thread_replies, [])
+        self.assertTrue(page.has_next())
+    
+    def test_more_replies_continue_from_cursor(self):
+        page = load_comment_threads(self.post, per_page=1, replies_per_thread=2)
+        
+        replies = load_replies(self.threads[0], page.object_list[0].replies_cursor)
+        
+        self.assertEqual(list(replies), self.replies[2:])
+        self.assertFalse(replies.has_next())
+    
+    def test_api_comment_threads(self):
+        page = load_comment_threads(self.post, per_page=20)
+        response = self.client.get(reverse('blog:api_comment_threads', args=[self.post.pk]))
+        data = response.json()
+        
+        self.assertEqual(len(data['threads']), 5)
+        self.assertEqual(data['threads'][0]['reply_count'], 4)
+        self.assertEqual(len(data['threads'][0]['replies']), 3)
+        self.assertEqual(data['threads'][0]['replies_cursor'], page.object_list[0].replies_cursor)
+        
+        response = self.client.get(reverse('blog:api_comment_replies', args=[self.threads[0].pk]), {'cursor': data['threads'][0]['replies_cursor']})
+        self.assertEqual([reply['id'] for reply in response.json()['replies']], [self.replies[3].id])
+
+
+class PostCardFragmentTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.post = Post.objects.create(title='Original title', content='Test content', author=self.user)
+    
+    def render(self, liked_ids=frozenset()):
+        posts = Post.objects.select_related('author__profile', 'category', 'subcategory').filter(pk=self.post.pk)
+        return render_post_cards(posts, liked_ids, True)
+    
+    def test_unchanged_post_is_served_from_cache(self):
+        self.render()
+        # A write that bypasses signals does not bump the version, so the cached card is reused
+        Post.objects.filter(pk=self.post.pk).update(title='Silently changed')
+        
+        self.assertIn('Original title', self.render())
+    
+    def test_post_comment_and_like_changes_bump_version(self):
+        self.render()
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.title = 'Edited title'
+            self.post.save()
+            # The version only moves once the write commits
+            self.assertIn('Original title', self.render())
+        self.assertIn('Edited title', self.render())
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(post=self.post, author=self.user, content='Test comment')
+        self.assertIn('<span class="ml-1">1</span>', self.render())
+    
+    def test_author_and_category_changes_bump_version(self):
+        category = Category.objects.create(name='Tech')
+        Post.objects.filter(pk=self.post.pk).update(category=category)
+        self.assertIn('Tech', self.render())
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            category.name = 'Science'
+            category.save()
+            self.user.username = 'renamed'
+            self.user.save()
+        html = self.render()
+        self.assertIn('Science', html)
+        self.assertIn('renamed', html)
+    
+    def test_login_does_not_bump_version(self):
+        self.render()
+        Post.objects.filter(pk=self.post.pk).update(title='Silently changed')
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.login(username='testuser', password='testpass')
+        self.assertIn('Original title', self.render())
+    
+    def test_like_state_is_spliced_per_viewer(self):
+        self.render()
+        
+        liked = self.render({self.post.pk})
+        not_liked = self.render()
+        
+        self.assertIn('data-liked="true"', liked)
+        self.assertIn('fas fa-heart', liked)
+        self.assertIn('data-liked="false"', not_liked)
+        self.assertNotIn('__liked_', liked + not_liked)
+
+
+class LeaderboardTest(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='testpass')
+        self.bob = User.objects.create_user(username='bob', password='testpass')
+        self.carol = User.objects.create_user(username='carol', password='testpass')
+    
+    def test_content_counts_in_every_window(self):
+        post = Post.objects.create(title='Story', content='Content', author=self.alice)
+        Comment.objects.create(post=post, author=self.bob, content='Nice')
+        
+        for window in leaderboard.WINDOWS:
+            _, alice_entry = leaderboard.rank_of(self.alice, window)
+            _, bob_entry = leaderboard.rank_of(self.bob, window)
+            self.assertEqual(alice_entry.post_count, 1)
+            self.assertEqual(bob_entry.comment_count, 1)
+        
+        post.delete()
+        self.assertEqual(leaderboard.rank_of(self.alice, 'daily')[1].post_count, 0)
+    
+    def test_top_and_rank(self):
+        leaderboard.record(self.alice.id, points=10)
+        leaderboard.record(self.bob.id, points=15)
+        leaderboard.record(self.carol.id, points=10)
+        
+        top = leaderboard.top('weekly')
+        self.assertEqual([entry.user for entry in top], [self.bob, self.alice, self.carol])
+        self.assertEqual(leaderboard.rank_of(self.carol, 'weekly')[0], 3)
+        
+        leaderboard.record(self.carol.id, points=-5)
+        self.assertEqual(leaderboard.rank_of(self.carol, 'all')[1].points, 5)
+    
+    def test_post_counts_when_published(self):
+        post = Post.objects.create(title='Draft', content='Content', author=self.alice, is_published=False)
+        self.assertEqual(leaderboard.rank_of(self.alice), (None, None))
+        
+        post.is_published = True
+        post.save()
+        post.save()
+        self.assertEqual(leaderboard.rank_of(self.alice)[1].post_count, 1)
+        
+        post = Post.objects.get(pk=post.pk)
+        post.is_published = False
+        post.save()
+        self.assertEqual(leaderboard.rank_of(self.alice)[1].post_count, 0)
+    
+    def test_decrements_stop_at_zero(self):
+        leaderboard.record(self.alice.id, points=3, comments=1)
+        leaderboard.record(self.alice.id, points=-5, comments=-2)
+        
+        entry = leaderboard.rank_of(self.alice)[1]
+        self.assertEqual((entry.points, entry.comment_count), (0, 0))
+    
+    def test_decrement_does_not_create_entry(self):
+        leaderboard.record(self.alice.id, points=-2)
+        self.assertFalse(LeaderboardEntry.objects.exists())
+        self.assertEqual(leaderboard.rank_of(self.alice), (None, None))
+    
+    def test_rebuild(self):
+        post = Post.objects.create(title='Story', content='Content', author=self.alice)
+        Like.objects.create(post=post, user=self.bob)
+        award_points(self.alice.id, 12)
+        LeaderboardEntry.objects.all().delete()
+        
+        call_command('rebuild_leaderboard', stdout=StringIO())
+        
+        entry = LeaderboardEntry.objects.get(user=self.alice, window='all')
+        self.assertEqual((entry.points, entry.post_count), (12, 1))
+        self.assertEqual(LeaderboardEntry.objects.get(user=self.alice, window='daily').points, 12)
@@ -13,4 +13,7 @@ urlpatterns = [
     path('subcategory/<int:subcategory_id>/', views.subcategory_posts, name='subcategory_posts'),
     path('search/', views.search_posts, name='search_posts'),
     path('leaderboard/', views.leaderboard, name='leaderboard'),
+    path('api/feed/', views.api_feed, name='api_feed'),
+    path('api/post/<int:pk>/comments/', views.api_comment_threads, name='api_comment_threads'),
+    path('api/comment/<int:pk>/replies/', views.api_comment_replies, name='api_comment_replies'),
 ]
\ No newline at end of file
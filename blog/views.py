@@ -1,55 +1,85 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q, Count
-from django.http import JsonResponse
+from django.db import transaction
+from django.http import Http404, JsonResponse
 from django.views.decorators.http import require_POST
 from django.core.paginator import Paginator
 from .models import Post, Category, Subcategory, Comment, Like
 from .forms import PostForm, CommentForm
-from django.contrib.auth.models import User
+from .feed import FEED_PAGE_SIZE, aload_feed_page, liked_post_ids, load_feed_page, serialize_post
+from .search import SearchResults
+from .fragments import FRAGMENT_CACHE_TIMEOUT, post_version
+from . import leaderboard as leaderboard_rankings
+from .comments import load_comment_threads, load_replies, serialize_comment, serialize_thread
+from .context_processors import category_post_count
+from storyverse.decorators import aget_user
+from accounts.points import award_points, POST_POINTS, COMMENT_POINTS, LIKE_POINTS
 
 
 
-def home(request):
-    posts = Post.objects.filter(is_published=True).order_by('-created_at')
+async def home(request):
+    await aget_user(request)
+    posts = Post.objects.filter(is_published=True)
     
     # Pagination
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
-    # Get categories for sidebar
-    categories = Category.objects.all()
+    page_obj, user_liked_posts = await aload_feed_page(request, posts)
     
     context = {
         'page_obj': page_obj,
-        'categories': categories,
+        'user_liked_posts': user_liked_posts,
     }
-    return render(request, 'blog/home.html', context)
+    return await sync_to_async(render)(request, 'blog/home.html', context)
 
 
-def post_detail(request, pk):
-    post = get_object_or_404(Post, pk=pk, is_published=True)
+async def post_detail(request, pk):
+    user = await aget_user(request)
+    try:
+        post = await Post.objects.select_related('author__profile', 'category', 'subcategory').aget(pk=pk, is_published=True)
+    except Post.DoesNotExist:
+        raise Http404('No Post matches the given query.')
     
-    # Get all comments for this post, ordered by creation time
-    comments = post.comments.all().order_by('created_at')
+    # Get the first page of comment threads, oldest first
+    threads = await sync_to_async(load_comment_threads)(post)
     
     # Check if current user liked this post
     is_liked = False
-    if request.user.is_authenticated:
-        is_liked = Like.objects.filter(post=post, user=request.user).exists()
+    if user.is_authenticated:
+        is_liked = await Like.objects.filter(post=post, user=user).aexists()
     
     # Comment form
     comment_form = CommentForm()
     
     context = {
         'post': post,
-        'comments': comments,
+        'post_version': await sync_to_async(post_version)(post),
+        'fragment_timeout': FRAGMENT_CACHE_TIMEOUT,
+        'comments': threads,
         'is_liked': is_liked,
         'comment_form': comment_form,
     }
-    return render(request, 'blog/post_detail.html', context)
+    return await sync_to_async(render)(request, 'blog/post_detail.html', context)
+
+
+def api_comment_threads(request, pk):
+    post = get_object_or_404(Post, pk=pk, is_published=True)
+    threads = load_comment_threads(post, request.GET.get('cursor'))
+    
+    return JsonResponse({
+        'threads': [serialize_thread(comment) for comment in threads],
+        'next_cursor': threads.next_cursor,
+    })
+
+
+def api_comment_replies(request, pk):
+    comment = get_object_or_404(Comment, pk=pk, post__is_published=True)
+    replies = load_replies(comment, request.GET.get('cursor'))
+    
+    return JsonResponse({
+        'replies': [serialize_comment(reply) for reply in replies],
+        'next_cursor': replies.next_cursor,
+    })
 
 
 @login_required
@@ -62,8 +92,7 @@ def create_post(request):
             post.save()
             
             # Award points for creating a post
-            request.user.profile.points += 10
-            request.user.profile.save()
+            award_points(request.user.id, POST_POINTS)
             
             messages.success(request, 'Your post has been created successfully!')
             return redirect('post_detail', pk=post.pk)
@@ -103,72 +132,75 @@ def delete_post(request, pk):
 
 def category_posts(request, category_id):
     category = get_object_or_404(Category, pk=category_id)
-    posts = Post.objects.filter(category=category, is_published=True).order_by('-created_at')
+    posts = Post.objects.filter(category=category, is_published=True)
     
     # Pagination
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
-    # Get categories for sidebar
-    categories = Category.objects.all()
+    page_obj, user_liked_posts = load_feed_page(request, posts)
     
     context = {
         'category': category,
+        'post_count': category_post_count(category.id),
         'page_obj': page_obj,
-        'categories': categories,
+        'user_liked_posts': user_liked_posts,
     }
     return render(request, 'blog/category_posts.html', context)
 
 
 def subcategory_posts(request, subcategory_id):
     subcategory = get_object_or_404(Subcategory, pk=subcategory_id)
-    posts = Post.objects.filter(subcategory=subcategory, is_published=True).order_by('-created_at')
+    posts = Post.objects.filter(subcategory=subcategory, is_published=True)
     
     # Pagination
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
-    # Get categories for sidebar
-    categories = Category.objects.all()
+    page_obj, user_liked_posts = load_feed_page(request, posts)
     
     context = {
         'subcategory': subcategory,
         'page_obj': page_obj,
-        'categories': categories,
+        'user_liked_posts': user_liked_posts,
     }
     return render(request, 'blog/subcategory_posts.html', context)
 
 
 def search_posts(request):
-    query = request.GET.get('q', '')
-    posts = Post.objects.none()
-    
-    if query:
-        posts = Post.objects.filter(
-            Q(title__icontains=query) | 
-            Q(content__icontains=query) | 
-            Q(author__username__icontains=query),
-            is_published=True
-        ).order_by('-created_at')
+    query = request.GET.get('q', '').strip()
+    results = SearchResults(query) if query else Post.objects.none()
     
     # Pagination
-    paginator = Paginator(posts, 10)
+    paginator = Paginator(results, FEED_PAGE_SIZE)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
-    
-    # Get categories for sidebar
-    categories = Category.objects.all()
+    user_liked_posts = liked_post_ids(request.user, page_obj)
     
     context = {
         'query': query,
         'page_obj': page_obj,
-        'categories': categories,
+        'user_liked_posts': user_liked_posts,
     }
     return render(request, 'blog/search_results.html', context)
 
 
+async def api_feed(request):
+    await aget_user(request)
+    posts = Post.objects.filter(is_published=True)
+    
+    category_id = request.GET.get('category')
+    subcategory_id = request.GET.get('subcategory')
+    try:
+        if category_id:
+            posts = posts.filter(category_id=int(category_id))
+        if subcategory_id:
+            posts = posts.filter(subcategory_id=int(subcategory_id))
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid filter'}, status=400)
+    
+    page_obj, user_liked_posts = await aload_feed_page(request, posts)
+    
+    return JsonResponse({
+        'posts': [serialize_post(post, user_liked_posts) for post in page_obj],
+        'next_cursor': page_obj.next_cursor,
+    })
+
+
 @login_required
 @require_POST
 def add_comment(request):
@@ -183,37 +215,25 @@ def add_comment(request):
         post = Post.objects.get(id=post_id)
         author = request.user
         
-        if parent_id:
-            parent = Comment.objects.get(id=parent_id)
-            comment = Comment.objects.create(post=post, author=author, content=content, parent=parent)
-            
-            # Create notification for reply
-            if parent.author != author:
-                from notifications.models import Notification
-                Notification.objects.create(
-                    recipient=parent.author,
-                    sender=author,
-                    notification_type='reply',
-                    text=f'{author.username} replied to your comment',
-                    related_object_id=comment.id
-                )
-        else:
-            comment = Comment.objects.create(post=post, author=author, content=content)
+        with transaction.atomic():
+            if parent_id:
+                parent = Comment.objects.get(id=parent_id)
+                comment = Comment.objects.create(post=post, author=author, content=content, parent=parent)
+                
+                # Create notification for reply
+                if parent.author != author:
+                    from notifications.aggregation import create_notification
+                    create_notification(parent.author, author, 'reply', comment.id)
+            else:
+                comment = Comment.objects.create(post=post, author=author, content=content)
+                
+                # Create notification for comment
+                if post.author != author:
+                    from notifications.aggregation import create_notification
+                    create_notification(post.author, author, 'comment', post.id)
             
-            # Create notification for comment
-            if post.author != author:
-                from notifications.models import Notification
-                Notification.objects.create(
-                    recipient=post.author,
-                    sender=author,
-                    notification_type='comment',
-                    text=f'{author.username} commented on your post',
-                    related_object_id=comment.id
-                )
-        
-        # Update points
-        author.profile.points += 3
-        author.profile.save()
+            # Update points
+            award_points(author.id, COMMENT_POINTS)
         
         return JsonResponse({
             'status': 'success',
@@ -244,33 +264,27 @@ def like_post(request):
     try:
         post = Post.objects.get(id=post_id)
         like, created = Like.objects.get_or_create(post=post, user=request.user)
+        post.refresh_from_db(fields=['like_count'])
         
         if created:
             # Update points
-            post.author.profile.points += 2
-            post.author.profile.save()
+            award_points(post.author_id, LIKE_POINTS)
             
             # Create notification
             if post.author != request.user:
-                from notifications.models import Notification
-                Notification.objects.create(
-                    recipient=post.author,
-                    sender=request.user,
-                    notification_type='like',
-                    text=f'{request.user.username} liked your post',
-                    related_object_id=post.id
-                )
+                from notifications.aggregation import create_notification
+                create_notification(post.author, request.user, 'like', post.id)
             
             return JsonResponse({
                 'status': 'success',
                 'message': 'You liked this post',
-                'likes_count': post.likes.count()
+                'likes_count': post.like_count
             })
         else:
             return JsonResponse({
                 'status': 'info',
                 'message': 'You already liked this post',
-                'likes_count': post.likes.count()
+                'likes_count': post.like_count
             })
     except Post.DoesNotExist:
         return JsonResponse({'status': 'error', 'message': 'Post not found'})
@@ -289,22 +303,22 @@ def unlike_post(request):
     try:
         post = Post.objects.get(id=post_id)
         deleted, _ = Like.objects.filter(post=post, user=request.user).delete()
+        post.refresh_from_db(fields=['like_count'])
         
         if deleted:
             # Update points
-            post.author.profile.points = max(0, post.author.profile.points - 2)
-            post.author.profile.save()
+            award_points(post.author_id, -LIKE_POINTS)
             
             return JsonResponse({
                 'status': 'success',
                 'message': 'You unliked this post',
-                'likes_count': post.likes.count()
+                'likes_count': post.like_count
             })
         else:
             return JsonResponse({
                 'status': 'info',
                 'message': 'You did not like this post',
-                'likes_count': post.likes.count()
+                'likes_count': post.like_count
             })
     except Post.DoesNotExist:
         return JsonResponse({'status': 'error', 'message': 'Post not found'})
@@ -313,17 +327,19 @@ def unlike_post(request):
 
 
 def leaderboard(request):
-    # Get top users by points
-    top_users = User.objects.annotate(
-        post_count=Count('post', filter=Q(post__is_published=True)),
-        comment_count=Count('comment')
-    ).select_related('profile').order_by('-profile__points')[:20]
+    window = request.GET.get('window', leaderboard_rankings.DEFAULT_WINDOW)
+    if window not in leaderboard_rankings.WINDOWS:
+        window = leaderboard_rankings.DEFAULT_WINDOW
     
-    # Get categories for sidebar
-    categories = Category.objects.all()
+    my_rank, my_entry = None, None
+    if request.user.is_authenticated:
+        my_rank, my_entry = leaderboard_rankings.rank_of(request.user, window)
     
     context = {
-        'top_users': top_users,
-        'categories': categories,
+        'entries': leaderboard_rankings.top(window),
+        'window': window,
+        'windows': leaderboard_rankings.WINDOWS,
+        'my_rank': my_rank,
+        'my_entry': my_entry,
     }
     return render(request, 'blog/leaderboard.html', context)
\ No newline at end of file
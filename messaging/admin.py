@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Message, Conversation
+from .models import Message, MessageArchive, Conversation, ConversationSummary
 
 
 @admin.register(Conversation)
@@ -10,7 +10,21 @@ class ConversationAdmin(admin.ModelAdmin):
 
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
-    list_display = ('conversation', 'sender', 'recipient', 'content', 'is_read', 'created_at')
-    list_filter = ('is_read', 'created_at')
+    list_display = ('conversation', 'sender', 'recipient', 'content', 'created_at')
+    list_filter = ('created_at',)
     search_fields = ('content', 'sender__username', 'recipient__username')
-    readonly_fields = ('created_at',)
\ No newline at end of file
+    readonly_fields = ('created_at',)
+
+
+@admin.register(ConversationSummary)
+class ConversationSummaryAdmin(admin.ModelAdmin):
+    list_display = ('conversation', 'user', 'other_user', 'last_activity_at', 'unread_count')
+    search_fields = ('user__username', 'other_user__username')
+    raw_id_fields = ('last_message',)
+
+
+@admin.register(MessageArchive)
+class MessageArchiveAdmin(admin.ModelAdmin):
+    list_display = ('conversation', 'message_count', 'first_created_at', 'last_created_at', 'archived_at')
+    exclude = ('data',)
+    readonly_fields = ('conversation', 'first_created_at', 'first_message_id', 'last_created_at', 'last_message_id', 'message_count', 'archived_at')
@@ -0,0 +1,118 @@
+import json
+import zlib
+from datetime import datetime
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+from .models import ConversationSummary, Message, MessageArchive
+
+
+ARCHIVE_SEGMENT_SIZE = 500
+
+
+def pack_messages(messages):
+    rows = [
+        [message.id, message.sender_id, message.recipient_id, message.content, message.created_at.isoformat()]
+        for message in messages
+    ]
+    return zlib.compress(json.dumps(rows, separators=(',', ':')).encode())
+
+
+def unpack_messages(segment):
+    """Rebuild a segment's messages, oldest first, as unsaved ``Message`` instances."""
+    rows = json.loads(zlib.decompress(bytes(segment.data)))
+    return [
+        Message(
+            id=message_id,
+            conversation_id=segment.conversation_id,
+            sender_id=sender_id,
+            recipient_id=recipient_id,
+            content=content,
+            created_at=datetime.fromisoformat(created_at)
+        )
+        for message_id, sender_id, recipient_id, content, created_at in rows
+    ]
+
+
+def archive_conversation(conversation_id, cutoff, segment_size=ARCHIVE_SEGMENT_SIZE):
+    """
+    Move a conversation's messages older than ``cutoff`` into archive segments.
+    
+    Messages go oldest first, one segment per transaction, so the hot table
+    always keeps the newest part of the conversation. The latest message
+    stays hot for the inbox summaries. Returns ``(messages, segments)``
+    archived.
+    """
+    candidates = Message.objects.filter(conversation_id=conversation_id, created_at__lt=cutoff).exclude(
+        id__in=ConversationSummary.objects.filter(
+            conversation_id=conversation_id, last_message__isnull=False
+        ).values('last_message_id')
+    ).order_by('created_at', 'id')
+    
+    archived = segments = 0
+    while True:
+        with transaction.atomic():
+            batch = list(candidates[:segment_size])
+            if not batch:
+                break
+            
+            MessageArchive.objects.create(
+                conversation_id=conversation_id,
+                first_created_at=batch[0].created_at,
+                first_message_id=batch[0].id,
+                last_created_at=batch[-1].created_at,
+                last_message_id=batch[-1].id,
+                message_count=len(batch),
+                data=pack_messages(batch)
+            )
+            Message.objects.filter(id__in=[message.id for message in batch]).delete()
+        
+        archived += len(batch)
+        segments += 1
+    return archived, segments
+
+
+def _attach_senders(messages):
+    senders = User.objects.select_related('profile').in_bulk({message.sender_id for message in messages})
+    for message in messages:
+        message.sender = senders[message.sender_id]
+
+
+def load_archived(conversation, position=None, limit=30, descending=True):
+    """
+    Read up to ``limit`` archived messages past a decoded ``(created_at, id)`` position.
+    
+    Walks newest to oldest when ``descending`` (from the newest archived
+    message if ``position`` is ``None``), otherwise oldest to newest.
+    Only the segments overlapping the requested range are decompressed,
+    and their senders are loaded in one query.
+    """
+    segments = MessageArchive.objects.filter(conversation=conversation)
+    if descending:
+        segments = segments.order_by('-last_created_at', '-last_message_id')
+        if position:
+            created_at, pk = position
+            segments = segments.filter(Q(first_created_at__lt=created_at) | Q(first_created_at=created_at, first_message_id__lt=pk))
+    else:
+        segments = segments.order_by('last_created_at', 'last_message_id')
+        if position:
+            created_at, pk = position
+            segments = segments.filter(Q(last_created_at__gt=created_at) | Q(last_created_at=created_at, last_message_id__gt=pk))
+    
+    messages = []
+    for segment in segments.iterator(chunk_size=4):
+        batch = unpack_messages(segment)
+        if descending:
+            batch.reverse()
+            if position:
+                batch = [message for message in batch if (message.created_at, message.id) < position]
+        elif position:
+            batch = [message for message in batch if (message.created_at, message.id) > position]
+        
+        messages.extend(batch[:limit - len(messages)])
+        if len(messages) >= limit:
+            break
+    
+    if messages:
+        _attach_senders(messages)
+    return messages
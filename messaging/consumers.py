@@ -1,16 +1,65 @@
 import json
+import time
+from collections import OrderedDict
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
 from .models import Message, Conversation
+from .history import load_history, serialize_message, serialize_sender
+from .writebehind import get_writer, next_message_id
+from .presence import PresenceMixin, TYPING_THROTTLE, load_peer_ids, online_user_ids, presence_group
 
 
-class ChatConsumer(AsyncWebsocketConsumer):
+# Recipients and conversations remembered per connection
+CONNECTION_CACHE_SIZE = 128
+
+
+class LRUCache:
+    """A mapping bounded to ``maxsize`` entries that evicts the least recently used one."""
+    
+    def __init__(self, maxsize=CONNECTION_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+    
+    def __contains__(self, key):
+        return key in self._entries
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def get(self, key, default=None):
+        if key not in self._entries:
+            return default
+        self._entries.move_to_end(key)
+        return self._entries[key]
+    
+    def set(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+class ChatConsumer(PresenceMixin, AsyncWebsocketConsumer):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Per-connection state, so steady-state sends skip lookups already done
+        self.sender = None
+        self.direct_conversations = LRUCache()  # recipient id -> conversation id
+        self.member_conversations = LRUCache()  # conversation ids this user belongs to
+        self.peer_ids = set()  # users whose presence this connection follows
+        self.typing_sent = LRUCache()  # recipient id -> when we last told them we were typing
+    
     async def connect(self):
         self.user = self.scope["user"]
         if self.user.is_anonymous:
             await self.close()
         else:
+            self.sender = await self.load_sender()
+            
             # Join a general group for this user to receive notifications
             self.user_group_name = f'user_{self.user.id}'
             await self.channel_layer.group_add(
@@ -19,6 +68,16 @@ class ChatConsumer(AsyncWebsocketConsumer):
             )
             
             await self.accept()
+            
+            # Follow every conversation peer's presence and say who is online right now
+            for peer_id in await load_peer_ids(self.user):
+                await self.watch_presence(peer_id)
+            await self.track_presence()
+            online = await database_sync_to_async(online_user_ids)(self.peer_ids)
+            await self.send(text_data=json.dumps({
+                'type': 'presence_snapshot',
+                'online': sorted(online)
+            }))
     
     async def disconnect(self, close_code):
         # Leave the user group
@@ -26,13 +85,30 @@ class ChatConsumer(AsyncWebsocketConsumer):
             self.user_group_name,
             self.channel_name
         )
+        
+        await self.untrack_presence()
+        for peer_id in self.peer_ids:
+            await self.channel_layer.group_discard(presence_group(peer_id), self.channel_name)
+        
+        if settings.MESSAGING_WRITE_BEHIND:
+            # Nothing this connection sent may be left only in memory
+            await get_writer().flush()
     
     async def receive(self, text_data):
         text_data_json = json.loads(text_data)
         action = text_data_json['action']
+        await self.refresh_presence()
         
         if action == 'send_message':
-            message_data = await self.send_message(text_data_json)
+            message = None
+            if settings.MESSAGING_WRITE_BEHIND:
+                message, message_data = await self.prepare_message(text_data_json)
+            else:
+                message_data = await self.send_message(text_data_json)
+            if 'error' in message_data:
+                await self.send(text_data=json.dumps({'type': 'error', **message_data}))
+                return
+            
             # Send message to recipient
             recipient_id = message_data['recipient_id']
             recipient_group_name = f'user_{recipient_id}'
@@ -48,8 +124,74 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 'type': 'message_sent',
                 'message_data': message_data
             }))
+            
+            await self.watch_presence(recipient_id)
+            
+            if message is not None:
+                # Stored after delivery, batched with other messages
+                await get_writer().add(message)
+        elif action == 'typing':
+            await self.send_typing(text_data_json)
         elif action == 'mark_read':
+            if settings.MESSAGING_WRITE_BEHIND:
+                # The messages being read may still be buffered; store them first, or their
+                # unread counts would be added back after the read watermark moved
+                await get_writer().flush()
             await self.mark_messages_read(text_data_json)
+        elif action == 'fetch_history':
+            history = await self.fetch_history(text_data_json)
+            await self.send(text_data=json.dumps({
+                'type': 'history',
+                **history
+            }))
+    
+    async def watch_presence(self, peer_id):
+        if peer_id not in self.peer_ids:
+            self.peer_ids.add(peer_id)
+            await self.channel_layer.group_add(presence_group(peer_id), self.channel_name)
+    
+    async def send_typing(self, data):
+        """
+        Tell a conversation peer this user is typing, at most once per ``TYPING_THROTTLE`` seconds.
+        
+        Keystrokes in between are dropped here rather than fanned out, and
+        only existing peers can be notified, so nothing reads the database.
+        """
+        try:
+            recipient_id = int(data['recipient_id'])
+        except (KeyError, TypeError, ValueError):
+            return
+        if recipient_id not in self.peer_ids:
+            return
+        
+        now = time.monotonic()
+        last_sent = self.typing_sent.get(recipient_id)
+        if last_sent is not None and now - last_sent < TYPING_THROTTLE:
+            return
+        self.typing_sent.set(recipient_id, now)
+        
+        await self.channel_layer.group_send(
+            f'user_{recipient_id}',
+            {
+                'type': 'typing_indicator',
+                'user_id': self.user.id,
+                'conversation_id': data.get('conversation_id')
+            }
+        )
+    
+    async def presence_changed(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'presence',
+            'user_id': event['user_id'],
+            'online': event['online']
+        }))
+    
+    async def typing_indicator(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'typing',
+            'user_id': event['user_id'],
+            'conversation_id': event['conversation_id']
+        }))
     
     async def chat_message(self, event):
         message_data = event['message_data']
@@ -59,61 +201,112 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'message_data': message_data
         }))
     
+    async def unread_count(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'unread_count',
+            'delta': event['delta'],
+            'unread_count': event['unread_count']
+        }))
+    
+    @database_sync_to_async
+    def load_sender(self):
+        return serialize_sender(self.user)
+    
+    def resolve_conversation(self, recipient_id):
+        """Return the id of the conversation with ``recipient_id``, resolved once per recipient for this connection."""
+        conversation_id = self.direct_conversations.get(recipient_id)
+        if conversation_id is None:
+            recipient = User.objects.get(id=recipient_id)
+            conversation, created = Conversation.get_or_create_direct(self.user.id, recipient.id)
+            conversation_id = conversation.id
+            self.direct_conversations.set(recipient_id, conversation_id)
+            self.member_conversations.set(conversation_id, True)
+        return conversation_id
+    
     @database_sync_to_async
     def send_message(self, data):
         try:
-            recipient_id = data['recipient_id']
+            recipient_id = int(data['recipient_id'])
             content = data['content']
             
-            recipient = User.objects.get(id=recipient_id)
-            
-            # Get or create conversation
-            conversations = Conversation.objects.filter(participants=self.user).filter(participants=recipient)
-            if conversations.exists():
-                conversation = conversations.first()
-            else:
-                conversation = Conversation.objects.create()
-                conversation.participants.add(self.user, recipient)
-            
-            # Create message
-            message = Message.objects.create(
-                conversation=conversation,
-                sender=self.user,
-                recipient=recipient,
-                content=content
-            )
+            with transaction.atomic():
+                conversation_id = self.resolve_conversation(recipient_id)
+                
+                # Create message; both participants' summaries are updated with it
+                message = Message.objects.create(
+                    conversation_id=conversation_id,
+                    sender=self.user,
+                    recipient_id=recipient_id,
+                    content=content
+                )
             
-            return {
-                'id': message.id,
-                'conversation_id': conversation.id,
-                'sender_id': message.sender.id,
-                'sender_username': message.sender.username,
-                'recipient_id': message.recipient.id,
-                'content': message.content,
-                'is_read': message.is_read,
-                'created_at': message.created_at.strftime('%B %d, %Y, %I:%M %p'),
-                'sender_avatar': message.sender.profile.profile_picture.url if message.sender.profile.profile_picture else None
-            }
+            return serialize_message(message, self.sender)
         except User.DoesNotExist:
             return {'error': 'Recipient not found'}
         except Exception as e:
             return {'error': str(e)}
     
+    async def prepare_message(self, data):
+        """
+        Build a message for write-behind delivery, returning ``(message, message_data)``.
+        
+        The id and timestamp are assigned here so the message can be fanned
+        out before it is stored. With the conversation cached this touches
+        no database at all.
+        """
+        try:
+            recipient_id = int(data['recipient_id'])
+            conversation_id = self.direct_conversations.get(recipient_id)
+            if conversation_id is None:
+                conversation_id = await database_sync_to_async(self.resolve_conversation)(recipient_id)
+            
+            message = Message(
+                id=next_message_id(),
+                conversation_id=conversation_id,
+                sender_id=self.user.id,
+                recipient_id=recipient_id,
+                content=data['content'],
+                created_at=timezone.now()
+            )
+            return message, serialize_message(message, self.sender)
+        except User.DoesNotExist:
+            return None, {'error': 'Recipient not found'}
+        except Exception as e:
+            return None, {'error': str(e)}
+    
     @database_sync_to_async
     def mark_messages_read(self, data):
         try:
             conversation_id = data['conversation_id']
-            conversation = Conversation.objects.get(id=conversation_id)
             
-            # Mark all messages from the other user as read
-            Message.objects.filter(
-                conversation=conversation,
-                recipient=self.user,
-                is_read=False
-            ).update(is_read=True)
+            # Mark all messages from the other user as read; only this user's own row is touched
+            Conversation(id=conversation_id).mark_read(self.user)
             
             return {'status': 'success'}
+        except Exception as e:
+            return {'error': str(e)}
+    
+    @database_sync_to_async
+    def fetch_history(self, data):
+        try:
+            conversation_id = int(data['conversation_id'])
+            if conversation_id in self.member_conversations:
+                conversation = Conversation(id=conversation_id)
+            else:
+                conversation = Conversation.objects.get(id=conversation_id, participants=self.user)
+                self.member_conversations.set(conversation_id, True)
+            
+            messages, before_cursor, after_cursor = load_history(
+                conversation, before=data.get('before'), after=data.get('after')
+            )
+            
+            return {
+                'conversation_id': conversation.id,
+                'messages': [serialize_message(message) for message in messages],
+                'before': before_cursor,
+                'after': after_cursor,
+            }
         except Conversation.DoesNotExist:
             return {'error': 'Conversation not found'}
         except Exception as e:
-            return {'error': str(e)}
\ No newline at end of file
+            return {'error': str(e)}
@@ -0,0 +1,75 @@
+from storyverse.pagination import cursor_rows, decode_cursor, encode_cursor
+from .archive import load_archived
+
+
+HISTORY_PAGE_SIZE = 30
+
+
+def history_queryset(conversation):
+    return conversation.messages.select_related('sender__profile')
+
+
+def load_history(conversation, before=None, after=None, per_page=HISTORY_PAGE_SIZE):
+    """
+    Load one page of a conversation's messages, keyed on ``(created_at, id)``.
+    
+    With no cursor this is the latest page; ``before`` walks back to older
+    messages and ``after`` forward to newer ones. Returns ``(messages,
+    before_cursor, after_cursor)`` with the messages oldest first and a cursor
+    for each direction that has more to fetch (``None`` otherwise).
+    
+    Archived messages are older than every hot one, so walking back reads
+    through to the archive once the hot rows run out, and walking forward
+    from an archived position comes back out into the hot rows.
+    """
+    queryset = history_queryset(conversation)
+    if after:
+        position = decode_cursor(after)
+        rows = load_archived(conversation, position, per_page + 1, descending=False)
+        if len(rows) <= per_page:
+            start = _position(rows[-1]) if rows else position
+            rows += cursor_rows(queryset, start, per_page + 1 - len(rows), descending=False)
+        rows, next_cursor = _trim(rows, per_page)
+        return rows, None, next_cursor
+    
+    position = decode_cursor(before)
+    rows = cursor_rows(queryset, position, per_page + 1)
+    if len(rows) <= per_page:
+        start = _position(rows[-1]) if rows else position
+        rows += load_archived(conversation, start, per_page + 1 - len(rows))
+    rows, next_cursor = _trim(rows, per_page)
+    return rows[::-1], next_cursor, None
+
+
+def _position(message):
+    return message.created_at, message.pk
+
+
+def _trim(rows, per_page):
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        return rows, encode_cursor(*_position(rows[-1]))
+    return rows, None
+
+
+def serialize_sender(user):
+    profile = user.profile
+    return {
+        'username': user.username,
+        'avatar': profile.profile_picture.url if profile.profile_picture else None,
+    }
+
+
+def serialize_message(message, sender=None):
+    """Serialize ``message``; pass a ``serialize_sender`` dict as ``sender`` to skip loading the sender."""
+    sender = sender or serialize_sender(message.sender)
+    return {
+        'id': message.id,
+        'conversation_id': message.conversation_id,
+        'content': message.content,
+        'sender_id': message.sender_id,
+        'sender_username': sender['username'],
+        'recipient_id': message.recipient_id,
+        'created_at': message.created_at.strftime('%B %d, %Y, %I:%M %p'),
+        'sender_avatar': sender['avatar']
+    }
@@ -0,0 +1,40 @@
+from .models import ConversationSummary
+
+
+def inbox_queryset(user):
+    """``user``'s conversation summaries, most recently active first, read off the inbox index."""
+    return ConversationSummary.objects.filter(user=user).select_related(
+        'last_message', 'other_user__profile'
+    ).order_by('-last_activity_at', '-id')
+
+
+def load_inbox(user):
+    """Return one dict per conversation of ``user``, most recently active first, in a single query."""
+    return [
+        {
+            'id': summary.conversation_id,
+            'other_participant': summary.other_user,
+            'last_message': summary.last_message,
+            'unread_count': summary.unread_count,
+        }
+        for summary in inbox_queryset(user)
+    ]
+
+
+def serialize_inbox_entry(entry):
+    other_participant = entry['other_participant']
+    last_message = entry['last_message']
+    profile = other_participant.profile if other_participant else None
+    return {
+        'id': entry['id'],
+        'other_participant_id': other_participant.id if other_participant else None,
+        'other_participant_username': other_participant.username if other_participant else None,
+        'other_participant_avatar': profile.profile_picture.url if profile and profile.profile_picture else None,
+        'last_message': {
+            'id': last_message.id,
+            'content': last_message.content,
+            'sender_id': last_message.sender_id,
+            'created_at': last_message.created_at.strftime('%B %d, %Y, %I:%M %p'),
+        } if last_message else None,
+        'unread_count': entry['unread_count'],
+    }
@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from messaging.archive import ARCHIVE_SEGMENT_SIZE, archive_conversation
+from messaging.models import Message
+
+
+class Command(BaseCommand):
+    help = 'Move messages older than the archive age out of the message table into compressed per-conversation segments'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.MESSAGING_ARCHIVE_AFTER_DAYS,
+                            help='Archive messages older than this many days')
+        parser.add_argument('--segment-size', type=int, default=ARCHIVE_SEGMENT_SIZE,
+                            help='Messages per archive segment')
+    
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        conversation_ids = Message.objects.filter(created_at__lt=cutoff).values_list(
+            'conversation_id', flat=True
+        ).distinct().order_by('conversation_id')
+        
+        archived = segments = conversations = 0
+        for conversation_id in list(conversation_ids):
+            messages, count = archive_conversation(conversation_id, cutoff, options['segment_size'])
+            if messages:
+                archived += messages
+                segments += count
+                conversations += 1
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {archived} message(s) from {conversations} conversation(s) into {segments} segment(s)'
+        ))
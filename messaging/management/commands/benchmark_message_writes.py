@@ -0,0 +1,62 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from messaging.models import Conversation, Message
+from messaging.writebehind import SnowflakeGenerator, persist_messages
+
+
+class Command(BaseCommand):
+    help = 'Compare message persistence throughput: one INSERT per message versus write-behind batches'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=2000, help='Messages to write with each strategy')
+        parser.add_argument('--batch-size', type=int, default=settings.MESSAGING_WRITE_BATCH_SIZE)
+    
+    def handle(self, *args, **options):
+        total = options['messages']
+        batch_size = options['batch_size']
+        stamp = int(time.time())
+        sender = User.objects.create_user(username=f'benchmark_sender_{stamp}')
+        recipient = User.objects.create_user(username=f'benchmark_recipient_{stamp}')
+        
+        try:
+            conversation, created = Conversation.get_or_create_direct(sender.id, recipient.id)
+            
+            # Today's path: each frame commits its own INSERT (and summary UPDATE)
+            started = time.perf_counter()
+            for i in range(total):
+                with transaction.atomic():
+                    Message.objects.create(conversation=conversation, sender=sender, recipient=recipient, content=f'Message {i}')
+            per_message = total / (time.perf_counter() - started)
+            
+            # Write-behind: ids assigned up front, persisted batch_size at a time
+            generator = SnowflakeGenerator(settings.MESSAGING_WORKER_ID)
+            started = time.perf_counter()
+            batch = []
+            for i in range(total):
+                batch.append(Message(
+                    id=generator.next_id(),
+                    conversation=conversation,
+                    sender=sender,
+                    recipient=recipient,
+                    content=f'Message {i}',
+                    created_at=timezone.now()
+                ))
+                if len(batch) >= batch_size:
+                    persist_messages(batch)
+                    batch = []
+            if batch:
+                persist_messages(batch)
+            write_behind = total / (time.perf_counter() - started)
+        finally:
+            # Remove the benchmark users, their conversation and its messages
+            Conversation.objects.filter(participants=sender).delete()
+            User.objects.filter(id__in=[sender.id, recipient.id]).delete()
+        
+        self.stdout.write(f'Per-message INSERT: {per_message:,.0f} messages/sec')
+        self.stdout.write(f'Write-behind (batches of {batch_size}): {write_behind:,.0f} messages/sec')
+        self.stdout.write(self.style.SUCCESS(f'Write-behind is {write_behind / per_message:.1f}x the per-message path'))
@@ -0,0 +1,49 @@
+from collections import defaultdict
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from messaging.models import Conversation, Message, MessageArchive
+
+
+class Command(BaseCommand):
+    help = 'Give every one-to-one conversation its direct key, merging duplicate conversations between the same pair of users'
+    
+    def handle(self, *args, **options):
+        Participant = Conversation.participants.through
+        direct_ids = Conversation.objects.filter(direct_key__isnull=True).annotate(
+            participant_count=Count('participants')
+        ).filter(participant_count__in=(1, 2)).values_list('id', flat=True)
+        
+        participants = defaultdict(list)
+        rows = Participant.objects.filter(conversation_id__in=list(direct_ids)).values_list('conversation_id', 'user_id')
+        for conversation_id, user_id in rows:
+            participants[conversation_id].append(user_id)
+        
+        groups = defaultdict(list)
+        for conversation_id, user_ids in participants.items():
+            groups[Conversation.direct_key_for(user_ids[0], user_ids[-1])].append(conversation_id)
+        keyed = dict(Conversation.objects.filter(direct_key__in=list(groups)).values_list('direct_key', 'id'))
+        
+        merged = 0
+        with transaction.atomic():
+            for key, conversation_ids in groups.items():
+                # An already keyed conversation wins; otherwise the oldest one does
+                conversation_ids.sort()
+                canonical_id = keyed.get(key, conversation_ids[0])
+                duplicate_ids = [conversation_id for conversation_id in conversation_ids if conversation_id != canonical_id]
+                
+                if duplicate_ids:
+                    Message.objects.filter(conversation_id__in=duplicate_ids).update(conversation_id=canonical_id)
+                    MessageArchive.objects.filter(conversation_id__in=duplicate_ids).update(conversation_id=canonical_id)
+                    Conversation.objects.filter(id__in=duplicate_ids).delete()
+                    merged += len(duplicate_ids)
+                Conversation.objects.filter(id=canonical_id).update(direct_key=key)
+            
+            if merged:
+                call_command('rebuild_conversation_summaries', stdout=self.stdout)
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Keyed {len(groups)} conversation(s), merging {merged} duplicate(s)'
+        ))
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from messaging.models import Conversation, ConversationSummary, Message
+
+
+class Command(BaseCommand):
+    help = 'Recompute every conversation summary from the messages table'
+    
+    def handle(self, *args, **options):
+        Participant = Conversation.participants.through
+        latest = Message.objects.filter(conversation=OuterRef('conversation_id')).order_by('-created_at', '-id')
+        watermark = ConversationSummary.objects.filter(
+            conversation=OuterRef('conversation_id'), user=OuterRef('user_id')
+        ).values('last_read_message_id')
+        unread = Message.objects.filter(
+            conversation=OuterRef('conversation_id'), recipient=OuterRef('user_id'), id__gt=OuterRef('watermark')
+        ).order_by().values('conversation').annotate(total=Count('id')).values('total')
+        other = Participant.objects.filter(
+            conversation=OuterRef('conversation_id')
+        ).exclude(user=OuterRef('user_id')).order_by('user_id').values('user_id')[:1]
+        
+        # Read watermarks are the only state that cannot be derived, so they are carried over
+        rows = Participant.objects.annotate(
+            last_message_id=Subquery(latest.values('id')[:1]),
+            last_message_at=Subquery(latest.values('created_at')[:1]),
+            other_user_id=Subquery(other),
+            watermark=Coalesce(Subquery(watermark), 0),
+        ).annotate(
+            unread=Coalesce(Subquery(unread, output_field=IntegerField()), 0),
+        ).values(
+            'conversation_id', 'conversation__created_at', 'user_id', 'other_user_id',
+            'last_message_id', 'last_message_at', 'watermark', 'unread'
+        )
+        
+        summaries = [
+            ConversationSummary(
+                conversation_id=row['conversation_id'],
+                user_id=row['user_id'],
+                other_user_id=row['other_user_id'],
+                last_message_id=row['last_message_id'],
+                last_activity_at=row['last_message_at'] or row['conversation__created_at'],
+                last_read_message_id=row['watermark'],
+                unread_count=row['unread'],
+            )
+            for row in rows
+        ]
+        
+        with transaction.atomic():
+            ConversationSummary.objects.all().delete()
+            ConversationSummary.objects.bulk_create(summaries, batch_size=500)
+        
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(summaries)} conversation summaries'))
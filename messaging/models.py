@@ -1,21 +1,72 @@
-from django.db import models
+from collections import Counter, defaultdict
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, F, When
+from django.db.models.functions import Coalesce
+from django.db.models.signals import m2m_changed, post_save
+from django.dispatch import receiver
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 
 class Conversation(models.Model):
     participants = models.ManyToManyField(User, related_name='conversations')
+    # "<lower user id>:<higher user id>" for one-to-one conversations
+    direct_key = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
         return f"Conversation {self.id}"
     
+    @staticmethod
+    def direct_key_for(user_id, other_user_id):
+        low, high = sorted((int(user_id), int(other_user_id)))
+        return f'{low}:{high}'
+    
+    @classmethod
+    def get_or_create_direct(cls, user_id, other_user_id):
+        """
+        Return ``(conversation, created)`` for the one-to-one conversation between two users.
+        
+        The lookup is a single unique-index probe on ``direct_key``. If two
+        first messages race, the unique constraint lets one insert win and
+        the other falls back to reading the winner's row.
+        """
+        key = cls.direct_key_for(user_id, other_user_id)
+        conversation = cls.objects.filter(direct_key=key).first()
+        if conversation:
+            return conversation, False
+        
+        try:
+            with transaction.atomic():
+                conversation = cls.objects.create(direct_key=key)
+                conversation.participants.add(*{int(user_id), int(other_user_id)})
+            return conversation, True
+        except IntegrityError:
+            return cls.objects.get(direct_key=key), False
+    
     @property
     def last_message(self):
         return self.messages.order_by('-created_at').first()
     
-    @property
+    def read_watermark(self, user):
+        """Id of the last message ``user`` has read here (0 if none)."""
+        return self.summaries.filter(user=user).values_list('last_read_message_id', flat=True).first() or 0
+    
     def unread_count(self, user):
-        return self.messages.filter(recipient=user, is_read=False).count()
+        return self.messages.filter(recipient=user, id__gt=self.read_watermark(user)).count()
+    
+    def mark_read(self, user):
+        """Mark everything up to the latest message read for ``user`` with a single row update."""
+        from .unread import unread_messages
+        
+        updated = self.summaries.filter(user=user).update(
+            last_read_message_id=Coalesce(F('last_message_id'), F('last_read_message_id')),
+            unread_count=0,
+        )
+        # How many were cleared isn't known without another read, so recount from committed rows
+        if updated:
+            unread_messages.refresh(user.id)
+        return updated
 
 
 class Message(models.Model):
@@ -23,16 +74,130 @@ class Message(models.Model):
     sender = models.ForeignKey(User, related_name='sent_messages', on_delete=models.CASCADE)
     recipient = models.ForeignKey(User, related_name='received_messages', on_delete=models.CASCADE)
     content = models.TextField()
-    is_read = models.BooleanField(default=False)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add, so write-behind batches keep the timestamp already sent to clients
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['conversation', '-created_at', '-id'], name='messaging_msg_recent_idx'),
+            models.Index(fields=['conversation', 'recipient', 'id'], name='messaging_msg_unread_idx'),
+        ]
     
     def __str__(self):
         return f'Message from {self.sender.username} to {self.recipient.username}'
     
-    def mark_as_read(self):
-        if not self.is_read:
-            self.is_read = True
-            self.save()
\ No newline at end of file
+    def save(self, *args, **kwargs):
+        if self.id is None:
+            from .writebehind import next_message_id, uses_snowflake_ids
+            if uses_snowflake_ids():
+                self.id = next_message_id()
+                kwargs['force_insert'] = True
+        super().save(*args, **kwargs)
+
+
+class ConversationSummary(models.Model):
+    """One participant's inbox row for a conversation, kept current as messages are sent and read."""
+    conversation = models.ForeignKey(Conversation, related_name='summaries', on_delete=models.CASCADE)
+    user = models.ForeignKey(User, related_name='conversation_summaries', on_delete=models.CASCADE)
+    other_user = models.ForeignKey(User, related_name='+', null=True, blank=True, on_delete=models.SET_NULL)
+    last_message = models.ForeignKey(Message, related_name='+', null=True, blank=True, on_delete=models.SET_NULL)
+    last_activity_at = models.DateTimeField()
+    last_read_message_id = models.PositiveBigIntegerField(default=0)
+    unread_count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ('conversation', 'user')
+        indexes = [
+            models.Index(fields=['user', '-last_activity_at', '-id'], name='messaging_summary_inbox_idx'),
+        ]
+        verbose_name_plural = 'Conversation summaries'
+    
+    def __str__(self):
+        return f'Conversation {self.conversation_id} for {self.user.username}'
+
+
+class MessageArchive(models.Model):
+    """
+    A compressed segment of a conversation's oldest messages, moved out of the hot ``Message`` table.
+    
+    Segments cover consecutive ``(created_at, id)`` ranges that are always
+    older than anything left in ``Message``, so history reads fall through
+    to them once the hot rows run out.
+    """
+    conversation = models.ForeignKey(Conversation, related_name='archives', on_delete=models.CASCADE)
+    first_created_at = models.DateTimeField()
+    first_message_id = models.PositiveBigIntegerField()
+    last_created_at = models.DateTimeField()
+    last_message_id = models.PositiveBigIntegerField()
+    message_count = models.PositiveIntegerField()
+    data = models.BinaryField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['conversation', '-last_created_at', '-last_message_id'], name='messaging_archive_range_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.message_count} archived messages in conversation {self.conversation_id}'
+
+
+@receiver(m2m_changed, sender=Conversation.participants.through)
+def create_conversation_summaries(sender, instance, action, reverse, pk_set, **kwargs):
+    if action != 'post_add':
+        return
+    
+    conversations = Conversation.objects.filter(pk__in=pk_set) if reverse else [instance]
+    for conversation in conversations:
+        participant_ids = list(conversation.participants.values_list('id', flat=True))
+        ConversationSummary.objects.bulk_create(
+            [
+                ConversationSummary(
+                    conversation=conversation,
+                    user_id=user_id,
+                    other_user_id=next((other_id for other_id in participant_ids if other_id != user_id), None),
+                    last_activity_at=conversation.created_at,
+                )
+                for user_id in participant_ids
+            ],
+            update_conflicts=True,
+            unique_fields=['conversation', 'user'],
+            update_fields=['other_user'],
+        )
+
+
+@receiver(post_save, sender=Message)
+def update_conversation_summaries(sender, instance, created, **kwargs):
+    if created:
+        update_summaries([instance])
+
+
+def update_summaries(messages):
+    """
+    Apply newly stored ``messages`` to their conversations' summaries.
+    
+    One UPDATE per conversation moves both participants' rows to the top of
+    their inboxes and adds each recipient's new unread messages.
+    """
+    from .unread import unread_messages
+    
+    by_conversation = defaultdict(list)
+    for message in messages:
+        by_conversation[message.conversation_id].append(message)
+    
+    for conversation_id, batch in by_conversation.items():
+        latest = max(batch, key=lambda message: (message.created_at, message.id))
+        unread = Counter(message.recipient_id for message in batch)
+        ConversationSummary.objects.filter(conversation_id=conversation_id).update(
+            last_message=latest,
+            last_activity_at=latest.created_at,
+            unread_count=Case(
+                *[When(user_id=user_id, then=F('unread_count') + total) for user_id, total in unread.items()],
+                default=F('unread_count'),
+                output_field=models.PositiveIntegerField(),
+            ),
+        )
+    
+    for user_id, total in Counter(message.recipient_id for message in messages).items():
+        unread_messages.adjust(user_id, total)
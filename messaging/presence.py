@@ -0,0 +1,107 @@
+import time
+
+from channels.db import database_sync_to_async
+from django.core.cache import cache
+from .models import ConversationSummary
+
+
+# Connections stay counted this long without a heartbeat, so crashed sockets age out
+PRESENCE_TTL = 60
+HEARTBEAT_INTERVAL = 25
+# At most one typing event per conversation per connection in this window
+TYPING_THROTTLE = 3
+
+
+def presence_key(user_id):
+    return f'presence:{user_id}'
+
+
+def presence_group(user_id):
+    return f'presence_{user_id}'
+
+
+def connection_opened(user_id):
+    """Count a new socket for ``user_id``. Returns ``True`` if the user just came online."""
+    key = presence_key(user_id)
+    cache.add(key, 0, PRESENCE_TTL)
+    try:
+        count = cache.incr(key)
+    except ValueError:
+        # Expired between add() and incr()
+        cache.set(key, 1, PRESENCE_TTL)
+        count = 1
+    cache.touch(key, PRESENCE_TTL)
+    return count == 1
+
+
+def connection_closed(user_id):
+    """Uncount a socket for ``user_id``. Returns ``True`` if the user just went offline."""
+    key = presence_key(user_id)
+    try:
+        count = cache.decr(key)
+    except ValueError:
+        return False
+    if count <= 0:
+        cache.delete(key)
+        return True
+    return False
+
+
+def heartbeat(user_id):
+    """Keep ``user_id`` online for another ``PRESENCE_TTL`` seconds."""
+    if not cache.touch(presence_key(user_id), PRESENCE_TTL):
+        cache.add(presence_key(user_id), 1, PRESENCE_TTL)
+
+
+def online_user_ids(user_ids):
+    """The subset of ``user_ids`` that currently have an open socket, in one cache round trip."""
+    keys = {presence_key(user_id): user_id for user_id in user_ids}
+    return {keys[key] for key, count in cache.get_many(keys).items() if count}
+
+
+def is_online(user_id):
+    return bool(cache.get(presence_key(user_id)))
+
+
+class PresenceMixin:
+    """
+    Count a consumer's socket towards its user's presence, without touching the database.
+    
+    Online and offline events are published once per transition to the
+    user's ``presence_<id>`` group, which each peer's chat socket joins, so a
+    user with many peers costs one group send rather than one per peer.
+    """
+    
+    async def track_presence(self):
+        self.last_heartbeat = time.monotonic()
+        if await database_sync_to_async(connection_opened)(self.user.id):
+            await self.publish_presence(True)
+    
+    async def untrack_presence(self):
+        if await database_sync_to_async(connection_closed)(self.user.id):
+            await self.publish_presence(False)
+    
+    async def refresh_presence(self):
+        # Any frame counts as a heartbeat, but the cache is only touched once per interval
+        now = time.monotonic()
+        if now - self.last_heartbeat >= HEARTBEAT_INTERVAL:
+            self.last_heartbeat = now
+            await database_sync_to_async(heartbeat)(self.user.id)
+    
+    async def publish_presence(self, online):
+        await self.channel_layer.group_send(
+            presence_group(self.user.id),
+            {
+                'type': 'presence_changed',
+                'user_id': self.user.id,
+                'online': online
+            }
+        )
+
+
+@database_sync_to_async
+def load_peer_ids(user):
+    """Ids of everyone ``user`` has a conversation with (a read, never a write)."""
+    return list(
+        ConversationSummary.objects.filter(user=user, other_user__isnull=False).values_list('other_user_id', flat=True)
+    )
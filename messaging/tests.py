@@ -1,6 +1,19 @@
-from django.test import TestCase
+import json
+from io import StringIO
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.core.management import call_command
 from django.contrib.auth.models import User
-from .models import Message, Conversation
+from django.urls import reverse
+from .models import Message, MessageArchive, Conversation, ConversationSummary
+from .inbox import load_inbox, serialize_inbox_entry
+from .history import load_history
+from .consumers import ChatConsumer, LRUCache
+from .unread import unread_messages
+from .presence import connection_closed, connection_opened, is_online, online_user_ids
+from . import writebehind
+from .writebehind import MAX_WRITE_ATTEMPTS, SNOWFLAKE_FLOOR, MessageWriter, SnowflakeGenerator, next_message_id, persist_messages
 
 
 class ConversationModelTest(TestCase):
@@ -65,9 +78,398 @@ class MessageModelTest(TestCase):
         self.assertEqual(self.message.sender, self.user1)
         self.assertEqual(self.message.recipient, self.user2)
         self.assertEqual(self.message.content, 'Test message')
-        self.assertFalse(self.message.is_read)
     
-    def test_mark_as_read(self):
-        self.assertFalse(self.message.is_read)
-        self.message.mark_as_read()
-        self.assertTrue(self.message.is_read)
\ No newline at end of file
+    def test_mark_read(self):
+        self.assertEqual(self.conversation.unread_count(self.user2), 1)
+        
+        with self.assertNumQueries(1):
+            self.conversation.mark_read(self.user2)
+        self.assertEqual(self.conversation.read_watermark(self.user2), self.message.id)
+        self.assertEqual(self.conversation.unread_count(self.user2), 0)
+        
+        Message.objects.create(conversation=self.conversation, sender=self.user1, recipient=self.user2, content='Another')
+        self.assertEqual(self.conversation.unread_count(self.user2), 1)
+
+
+class UnreadCountApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user1 = User.objects.create_user(username='user1', password='testpass')
+        self.user2 = User.objects.create_user(username='user2', password='testpass')
+        for _ in range(2):
+            conversation = Conversation.objects.create()
+            conversation.participants.add(self.user1, self.user2)
+            Message.objects.create(conversation=conversation, sender=self.user2, recipient=self.user1, content='Hi')
+        Message.objects.create(conversation=conversation, sender=self.user1, recipient=self.user2, content='Hello')
+    
+    def test_unread_count(self):
+        self.client.login(username='user1', password='testpass')
+        response = self.client.get(reverse('messaging:api_unread_count'))
+        self.assertEqual(response.json(), {'unread_count': 2})
+    
+    def test_counter_follows_writes(self):
+        self.assertEqual(unread_messages.get(self.user1.id), 2)
+        conversation = Conversation.objects.filter(participants=self.user1).first()
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.objects.create(conversation=conversation, sender=self.user2, recipient=self.user1, content='More')
+        with self.assertNumQueries(0):
+            self.assertEqual(unread_messages.get(self.user1.id), 3)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            conversation.mark_read(self.user1)
+        self.assertEqual(unread_messages.get(self.user1.id), 1)
+        self.assertEqual(unread_messages.compute(self.user1.id), 1)
+
+
+class InboxLoaderTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='user', password='testpass')
+        self.others = [User.objects.create_user(username=f'other{i}', password='testpass') for i in range(3)]
+        self.conversations = []
+        for other in self.others:
+            conversation = Conversation.objects.create()
+            conversation.participants.add(self.user, other)
+            self.conversations.append(conversation)
+        
+        Message.objects.create(conversation=self.conversations[0], sender=self.others[0], recipient=self.user, content='First')
+        Message.objects.create(conversation=self.conversations[1], sender=self.others[1], recipient=self.user, content='Second')
+        Message.objects.create(conversation=self.conversations[1], sender=self.others[1], recipient=self.user, content='Third')
+        Message.objects.create(conversation=self.conversations[0], sender=self.user, recipient=self.others[0], content='Reply')
+    
+    def test_load_inbox(self):
+        with self.assertNumQueries(1):
+            inbox = load_inbox(self.user)
+            [entry['other_participant'].profile for entry in inbox]
+        
+        self.assertEqual([entry['id'] for entry in inbox], [conversation.id for conversation in self.conversations])
+        self.assertEqual(inbox[0]['last_message'].content, 'Reply')
+        self.assertEqual(inbox[0]['other_participant'], self.others[0])
+        self.assertEqual([entry['unread_count'] for entry in inbox], [1, 2, 0])
+        self.assertIsNone(inbox[2]['last_message'])
+    
+    def test_serialize(self):
+        data = serialize_inbox_entry(load_inbox(self.user)[1])
+        self.assertEqual(data['other_participant_username'], 'other1')
+        self.assertEqual(data['last_message']['content'], 'Third')
+        self.assertEqual(data['last_message']['sender_id'], self.others[1].id)
+    
+    def test_mark_read(self):
+        self.conversations[1].mark_read(self.user)
+        self.assertEqual([entry['unread_count'] for entry in load_inbox(self.user)], [1, 0, 0])
+        self.assertEqual(load_inbox(self.others[0])[0]['unread_count'], 1)
+    
+    def test_rebuild_matches_incremental_updates(self):
+        self.conversations[0].mark_read(self.user)
+        Message.objects.create(conversation=self.conversations[0], sender=self.others[0], recipient=self.user, content='Later')
+        expected = load_inbox(self.user)
+        ConversationSummary.objects.update(unread_count=99, last_message=None)
+        
+        call_command('rebuild_conversation_summaries', stdout=StringIO())
+        self.assertEqual(load_inbox(self.user), expected)
+        self.assertEqual(expected[0]['unread_count'], 1)
+
+
+class MessageHistoryTest(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username='user1', password='testpass')
+        self.user2 = User.objects.create_user(username='user2', password='testpass')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.user1, self.user2)
+        self.messages = [
+            Message.objects.create(conversation=self.conversation, sender=self.user1, recipient=self.user2, content=f'Message {i}')
+            for i in range(7)
+        ]
+    
+    def test_pages_backwards(self):
+        latest, before, after = load_history(self.conversation, per_page=3)
+        self.assertEqual(latest, self.messages[4:])
+        self.assertIsNone(after)
+        
+        older, before, _ = load_history(self.conversation, before=before, per_page=3)
+        self.assertEqual(older, self.messages[1:4])
+        
+        oldest, before, _ = load_history(self.conversation, before=before, per_page=3)
+        self.assertEqual(oldest, self.messages[:1])
+        self.assertIsNone(before)
+    
+    def test_pages_forwards(self):
+        _, before, _ = load_history(self.conversation, per_page=3)
+        
+        # The cursor marks Message 4, so catching up starts after it
+        newer, _, after = load_history(self.conversation, after=before, per_page=1)
+        self.assertEqual(newer, self.messages[5:6])
+        
+        newest, _, after = load_history(self.conversation, after=after, per_page=1)
+        self.assertEqual(newest, self.messages[6:])
+        self.assertIsNone(after)
+    
+    def test_reads_through_archive(self):
+        call_command('archive_messages', days=0, segment_size=2, stdout=StringIO())
+        self.assertEqual(list(Message.objects.all()), self.messages[6:])
+        self.assertEqual(MessageArchive.objects.count(), 3)
+        
+        latest, before, _ = load_history(self.conversation, per_page=3)
+        self.assertEqual(latest, self.messages[4:])
+        self.assertEqual(latest[0].sender, self.user1)
+        
+        older, before, _ = load_history(self.conversation, before=before, per_page=3)
+        self.assertEqual(older, self.messages[1:4])
+        
+        oldest, before, _ = load_history(self.conversation, before=before, per_page=3)
+        self.assertEqual(oldest, self.messages[:1])
+        self.assertIsNone(before)
+        
+        # Forward from inside the archive comes back out into the hot rows
+        _, before, _ = load_history(self.conversation, per_page=3)
+        newer, _, after = load_history(self.conversation, after=before, per_page=3)
+        self.assertEqual(newer, self.messages[5:])
+        self.assertIsNone(after)
+    
+    def test_api_messages(self):
+        self.client.login(username='user2', password='testpass')
+        data = self.client.get(reverse('messaging:api_messages', args=[self.conversation.id])).json()
+        
+        self.assertEqual([message['content'] for message in data['messages']], [f'Message {i}' for i in range(7)])
+        self.assertIsNone(data['before'])
+        self.assertEqual(data['messages'][0]['sender_username'], 'user1')
+    
+    def test_fetch_history_action(self):
+        consumer = ChatConsumer()
+        consumer.user = self.user2
+        _, before, _ = load_history(self.conversation, per_page=5)
+        
+        history = async_to_sync(consumer.fetch_history)({'conversation_id': self.conversation.id, 'before': before})
+        self.assertEqual([message['id'] for message in history['messages']], [message.id for message in self.messages[:2]])
+        
+        consumer = ChatConsumer()
+        consumer.user = User.objects.create_user(username='outsider', password='testpass')
+        history = async_to_sync(consumer.fetch_history)({'conversation_id': self.conversation.id})
+        self.assertEqual(history, {'error': 'Conversation not found'})
+
+
+class DirectConversationTest(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username='user1', password='testpass')
+        self.user2 = User.objects.create_user(username='user2', password='testpass')
+    
+    def test_get_or_create_direct(self):
+        conversation, created = Conversation.get_or_create_direct(self.user1.id, self.user2.id)
+        self.assertTrue(created)
+        self.assertEqual(conversation.direct_key, f'{self.user1.id}:{self.user2.id}')
+        self.assertEqual(set(conversation.participants.all()), {self.user1, self.user2})
+        
+        with self.assertNumQueries(1):
+            same, created = Conversation.get_or_create_direct(self.user2.id, self.user1.id)
+        self.assertFalse(created)
+        self.assertEqual(same, conversation)
+    
+    def test_merge_duplicates(self):
+        conversations = []
+        for content in ('First', 'Second'):
+            conversation = Conversation.objects.create()
+            conversation.participants.add(self.user1, self.user2)
+            Message.objects.create(conversation=conversation, sender=self.user1, recipient=self.user2, content=content)
+            conversations.append(conversation)
+        
+        call_command('merge_duplicate_conversations', stdout=StringIO())
+        
+        canonical = Conversation.objects.get()
+        self.assertEqual(canonical, conversations[0])
+        self.assertEqual(canonical.direct_key, Conversation.direct_key_for(self.user1.id, self.user2.id))
+        self.assertEqual(canonical.messages.count(), 2)
+        self.assertEqual(load_inbox(self.user2)[0]['unread_count'], 2)
+        self.assertEqual(Conversation.get_or_create_direct(self.user1.id, self.user2.id), (canonical, False))
+
+
+class ChatConsumerCacheTest(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username='user1', password='testpass')
+        self.user2 = User.objects.create_user(username='user2', password='testpass')
+        self.consumer = ChatConsumer()
+        self.consumer.user = self.user1
+        self.consumer.sender = async_to_sync(self.consumer.load_sender)()
+    
+    def send(self, content):
+        return async_to_sync(self.consumer.send_message)({'recipient_id': str(self.user2.id), 'content': content})
+    
+    def test_steady_state_send_skips_lookups(self):
+        first = self.send('Hello')
+        
+        # The message INSERT plus the summary UPDATE, inside one savepoint
+        with self.assertNumQueries(4):
+            second = self.send('Again')
+        
+        self.assertEqual(second['conversation_id'], first['conversation_id'])
+        self.assertEqual(second['sender_username'], 'user1')
+        self.assertEqual(Message.objects.filter(conversation_id=first['conversation_id']).count(), 2)
+    
+    def test_unknown_recipient(self):
+        message_data = async_to_sync(self.consumer.send_message)({'recipient_id': 0, 'content': 'Hello'})
+        self.assertEqual(message_data, {'error': 'Recipient not found'})
+    
+    def test_cache_is_bounded(self):
+        cache = LRUCache(maxsize=2)
+        cache.set(1, 'a')
+        cache.set(2, 'b')
+        cache.get(1)
+        cache.set(3, 'c')
+        
+        self.assertIn(1, cache)
+        self.assertNotIn(2, cache)
+        self.assertEqual(len(cache), 2)
+
+
+class RecordingChannelLayer:
+    def __init__(self):
+        self.sent = []
+    
+    async def group_send(self, group, message):
+        self.sent.append((group, message))
+
+
+class PresenceTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user1 = User.objects.create_user(username='user1', password='testpass')
+        self.user2 = User.objects.create_user(username='user2', password='testpass')
+    
+    def test_counts_connections(self):
+        self.assertTrue(connection_opened(self.user1.id))
+        self.assertFalse(connection_opened(self.user1.id))
+        self.assertFalse(connection_closed(self.user1.id))
+        self.assertTrue(is_online(self.user1.id))
+        
+        self.assertTrue(connection_closed(self.user1.id))
+        self.assertFalse(is_online(self.user1.id))
+        self.assertFalse(connection_closed(self.user1.id))
+    
+    def test_online_user_ids(self):
+        connection_opened(self.user2.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(online_user_ids([self.user1.id, self.user2.id]), {self.user2.id})
+    
+    def test_typing_is_throttled(self):
+        consumer = ChatConsumer()
+        consumer.user = self.user1
+        consumer.channel_layer = RecordingChannelLayer()
+        consumer.peer_ids = {self.user2.id}
+        typing = {'recipient_id': str(self.user2.id), 'conversation_id': 1}
+        
+        with self.assertNumQueries(0):
+            for _ in range(5):
+                async_to_sync(consumer.send_typing)(typing)
+            async_to_sync(consumer.send_typing)({'recipient_id': '999', 'conversation_id': 2})
+        
+        self.assertEqual(consumer.channel_layer.sent, [
+            (f'user_{self.user2.id}', {'type': 'typing_indicator', 'user_id': self.user1.id, 'conversation_id': 1})
+        ])
+
+
+class WriteBehindTest(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username='user1', password='testpass')
+        self.user2 = User.objects.create_user(username='user2', password='testpass')
+        self.conversation, _ = Conversation.get_or_create_direct(self.user1.id, self.user2.id)
+    
+    def build(self, content):
+        return Message(
+            id=next_message_id(),
+            conversation=self.conversation,
+            sender=self.user1,
+            recipient=self.user2,
+            content=content
+        )
+    
+    def test_snowflake_ids_are_unique_and_ordered(self):
+        generator = SnowflakeGenerator(worker_id=3)
+        ids = [generator.next_id() for _ in range(5000)]
+        self.assertEqual(ids, sorted(set(ids)))
+    
+    def test_persist_batch_updates_summaries(self):
+        messages = [self.build(f'Message {i}') for i in range(3)]
+        persist_messages(messages)
+        
+        self.assertEqual(list(self.conversation.messages.all()), messages)
+        entry = load_inbox(self.user2)[0]
+        self.assertEqual(entry['last_message'], messages[-1])
+        self.assertEqual(entry['unread_count'], 3)
+    
+    def test_writer_flushes_full_batches(self):
+        writer = MessageWriter(batch_size=2, flush_interval=60)
+        
+        async def add(*messages):
+            for message in messages:
+                await writer.add(message)
+        
+        async_to_sync(add)(self.build('One'), self.build('Two'), self.build('Three'))
+        self.assertEqual(self.conversation.messages.count(), 2)
+        self.assertEqual(len(writer.pending), 1)
+        
+        writer.flush_sync()
+        self.assertEqual(self.conversation.messages.count(), 3)
+    
+    def test_failing_row_is_isolated_and_dead_lettered(self):
+        stored = self.build('Stored')
+        persist_messages([stored])
+        duplicate = self.build('Duplicate')
+        duplicate.id = stored.id
+        writer = MessageWriter(batch_size=100, flush_interval=60)
+        
+        async def flush_until_dead_lettered(*messages):
+            for message in messages:
+                await writer.add(message)
+            for _ in range(MAX_WRITE_ATTEMPTS):
+                await writer.flush()
+            writer._timer.cancel()
+        
+        good = [self.build('One'), self.build('Two')]
+        with self.assertLogs('messaging.dead_letters') as logs, self.assertLogs('messaging.writebehind'):
+            async_to_sync(flush_until_dead_lettered)(good[0], duplicate, good[1])
+        
+        self.assertEqual(list(self.conversation.messages.all()), [stored] + good)
+        self.assertEqual(writer.pending, [])
+        self.assertEqual(writer.attempts, {})
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn('"content": "Duplicate"', logs.output[0])
+    
+    def test_keeps_snowflake_ids_once_stored(self):
+        writebehind._snowflake_ids = None
+        self.addCleanup(setattr, writebehind, '_snowflake_ids', None)
+        persist_messages([self.build('Write-behind')])
+        
+        # Write-behind is off, but a sequence id would now sort before the stored message
+        message = Message.objects.create(conversation=self.conversation, sender=self.user2, recipient=self.user1, content='Later')
+        self.assertGreaterEqual(message.id, SNOWFLAKE_FLOOR)
+        self.assertEqual(self.conversation.messages.last(), message)
+    
+    @override_settings(MESSAGING_WRITE_BEHIND=True)
+    def test_mark_read_stores_buffered_messages_first(self):
+        self.addCleanup(setattr, writebehind, '_writer', writebehind._writer)
+        writebehind._writer = MessageWriter(batch_size=100, flush_interval=60)
+        consumer = ChatConsumer()
+        consumer.user = self.user2
+        consumer.last_heartbeat = 0
+        
+        async def read_after_buffering(message):
+            await writebehind._writer.add(message)
+            await consumer.receive(json.dumps({'action': 'mark_read', 'conversation_id': self.conversation.id}))
+            writebehind._writer._timer.cancel()
+        
+        async_to_sync(read_after_buffering)(self.build('Seen'))
+        
+        self.assertEqual(self.conversation.messages.count(), 1)
+        self.assertEqual(load_inbox(self.user2)[0]['unread_count'], 0)
+    
+    @override_settings(MESSAGING_WRITE_BEHIND=True)
+    def test_prepare_message_skips_database_when_cached(self):
+        consumer = ChatConsumer()
+        consumer.user = self.user1
+        consumer.sender = async_to_sync(consumer.load_sender)()
+        async_to_sync(consumer.prepare_message)({'recipient_id': self.user2.id, 'content': 'Warm up'})
+        
+        with self.assertNumQueries(0):
+            message, message_data = async_to_sync(consumer.prepare_message)({'recipient_id': self.user2.id, 'content': 'Hi'})
+        self.assertEqual(message_data['id'], message.id)
+        self.assertEqual(message_data['conversation_id'], self.conversation.id)
+        self.assertFalse(Message.objects.exists())
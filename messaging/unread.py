@@ -0,0 +1,13 @@
+from django.db.models import Sum
+from storyverse.counters import UnreadCounter
+from .models import ConversationSummary
+
+
+def count_unread_messages(user_id):
+    # Sum the stored per-conversation unread counts
+    totals = ConversationSummary.objects.filter(user_id=user_id).aggregate(unread=Sum('unread_count'))
+    return totals['unread'] or 0
+
+
+# Pushed to ChatConsumer through the user's chat group
+unread_messages = UnreadCounter('unread_messages', 'user_{user_id}', count_unread_messages)
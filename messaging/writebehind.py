@@ -0,0 +1,205 @@
+import asyncio
+import atexit
+import json
+import logging
+import threading
+import time
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import transaction
+from .models import Message, update_summaries
+
+
+logger = logging.getLogger(__name__)
+# Messages that could not be stored, one JSON row per record, so they can be replayed
+dead_letters = logging.getLogger('messaging.dead_letters')
+
+# Snowflake ids: milliseconds since EPOCH_MS, then the worker id, then a per-millisecond sequence
+EPOCH_MS = 1704067200000  # 2024-01-01T00:00:00Z
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+# No autoincrement sequence gets near this, and every snowflake issued more than a few minutes after EPOCH_MS is above it
+SNOWFLAKE_FLOOR = 1 << 40
+
+# Failed attempts at storing one message before it is dead-lettered
+MAX_WRITE_ATTEMPTS = 3
+RETRY_INTERVAL = 1.0  # seconds
+
+
+class SnowflakeGenerator:
+    """
+    Hand out unique, time-ordered 64-bit ids without touching the database.
+    
+    Ids sort by creation time, so keyset pagination and read watermarks keep
+    working. They are larger than any autoincrement id issued before, but a
+    database sequence will not follow them; once any are stored, every new
+    message gets one too (see ``uses_snowflake_ids``).
+    """
+    
+    def __init__(self, worker_id):
+        self.worker_id = worker_id & ((1 << WORKER_BITS) - 1)
+        self.last_ms = -1
+        self.sequence = 0
+        self._lock = threading.Lock()
+    
+    def next_id(self):
+        with self._lock:
+            now = max(int(time.time() * 1000), self.last_ms)
+            if now == self.last_ms:
+                self.sequence = (self.sequence + 1) & ((1 << SEQUENCE_BITS) - 1)
+                if self.sequence == 0:
+                    # Sequence exhausted for this millisecond; borrow the next one
+                    now += 1
+            else:
+                self.sequence = 0
+            self.last_ms = now
+            return ((now - EPOCH_MS) << (WORKER_BITS + SEQUENCE_BITS)) | (self.worker_id << SEQUENCE_BITS) | self.sequence
+
+
+def persist_messages(messages):
+    """Store a batch of messages and apply them to the conversation summaries in one transaction."""
+    with transaction.atomic():
+        Message.objects.bulk_create(messages)
+        update_summaries(messages)
+
+
+def persist_or_isolate(messages):
+    """
+    Store ``messages``, halving a batch that fails until the failing rows are isolated.
+    
+    One bad row (say its conversation was deleted meanwhile) then costs
+    only itself, not the rest of the batch. Returns the messages that
+    could not be stored.
+    """
+    try:
+        persist_messages(messages)
+        return []
+    except Exception:
+        if len(messages) == 1:
+            logger.exception('Failed to persist chat message %s', messages[0].id)
+            return list(messages)
+    
+    middle = len(messages) // 2
+    return persist_or_isolate(messages[:middle]) + persist_or_isolate(messages[middle:])
+
+
+def dead_letter(message):
+    dead_letters.error(json.dumps({
+        'id': message.id,
+        'conversation_id': message.conversation_id,
+        'sender_id': message.sender_id,
+        'recipient_id': message.recipient_id,
+        'content': message.content,
+        'created_at': message.created_at.isoformat(),
+    }))
+
+
+class MessageWriter:
+    """
+    Buffer outgoing messages and persist them with ``bulk_create``.
+    
+    A batch is written once ``batch_size`` messages are waiting or
+    ``flush_interval`` seconds after the first one arrived, whichever comes
+    first. Rows of a failed batch are retried one by one; a message that
+    still fails after ``MAX_WRITE_ATTEMPTS`` flushes is dead-lettered
+    rather than blocking everything queued behind it.
+    """
+    
+    def __init__(self, batch_size, flush_interval):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending = []
+        self.attempts = {}  # message id -> failed flushes so far
+        self._timer = None
+        self._lock = asyncio.Lock()
+    
+    async def add(self, message):
+        self.pending.append(message)
+        if len(self.pending) >= self.batch_size:
+            await self.flush()
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.ensure_future(self._flush_later())
+    
+    async def _flush_later(self, delay=None):
+        await asyncio.sleep(self.flush_interval if delay is None else delay)
+        await self.flush()
+    
+    async def flush(self):
+        async with self._lock:
+            batch, self.pending = self.pending, []
+            if not batch:
+                return
+            
+            failed = await database_sync_to_async(persist_or_isolate)(batch)
+            if self._requeue(batch, failed):
+                self._timer = asyncio.ensure_future(self._flush_later(RETRY_INTERVAL))
+    
+    def _requeue(self, batch, failed):
+        """Put failed messages back at the front of the queue, dead-lettering those out of attempts."""
+        failed_ids = {message.id for message in failed}
+        for message in batch:
+            if message.id not in failed_ids:
+                self.attempts.pop(message.id, None)
+        
+        retry = []
+        for message in failed:
+            attempts = self.attempts.pop(message.id, 0) + 1
+            if attempts >= MAX_WRITE_ATTEMPTS:
+                dead_letter(message)
+            else:
+                self.attempts[message.id] = attempts
+                retry.append(message)
+        self.pending[:0] = retry
+        return retry
+    
+    def flush_sync(self):
+        """Write whatever is still buffered from outside the event loop, e.g. at interpreter exit."""
+        batch, self.pending = self.pending, []
+        for _ in range(MAX_WRITE_ATTEMPTS):
+            if not batch:
+                return
+            batch = persist_or_isolate(batch)
+        
+        # Nothing will retry these once the process is gone
+        for message in batch:
+            dead_letter(message)
+
+
+_generator = None
+_writer = None
+_snowflake_ids = None
+
+
+def next_message_id():
+    global _generator
+    if _generator is None:
+        _generator = SnowflakeGenerator(settings.MESSAGING_WORKER_ID)
+    return _generator.next_id()
+
+
+def uses_snowflake_ids():
+    """
+    Whether new messages must get snowflake ids rather than database sequence ids.
+    
+    Always with write-behind on. With it off, only while the table holds
+    snowflake ids from an earlier run (checked once per process): a
+    sequence id issued after them would sort before messages already read
+    and slip under every read watermark. To go back to sequence ids,
+    advance the table's sequence past the largest stored id first.
+    """
+    global _snowflake_ids
+    if settings.MESSAGING_WRITE_BEHIND:
+        return True
+    if _snowflake_ids is None:
+        _snowflake_ids = Message.objects.filter(id__gte=SNOWFLAKE_FLOOR).exists()
+    return _snowflake_ids
+
+
+def get_writer():
+    """The process-wide ``MessageWriter``, flushed durably when the process exits."""
+    global _writer
+    if _writer is None:
+        _writer = MessageWriter(settings.MESSAGING_WRITE_BATCH_SIZE, settings.MESSAGING_WRITE_FLUSH_INTERVAL)
+        atexit.register(_writer.flush_sync)
+    return _writer
@@ -1,10 +1,17 @@
 from django.contrib import admin
-from .models import Notification
+from .models import Notification, NotificationCounter
 
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
-    list_display = ('recipient', 'sender', 'notification_type', 'text', 'is_read', 'created_at')
+    list_display = ('recipient', 'sender', 'notification_type', 'text', 'actor_count', 'is_read', 'created_at')
     list_filter = ('notification_type', 'is_read', 'created_at')
     search_fields = ('text', 'recipient__username', 'sender__username')
-    readonly_fields = ('created_at',)
\ No newline at end of file
+    readonly_fields = ('created_at',)
+
+
+@admin.register(NotificationCounter)
+class NotificationCounterAdmin(admin.ModelAdmin):
+    list_display = ('user', 'unread_count')
+    search_fields = ('user__username',)
+    readonly_fields = ('unread_count',)
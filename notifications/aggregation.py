@@ -0,0 +1,96 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Notification, NotificationActor
+from .dispatch import dispatch
+
+
+AGGREGATED_TYPES = ('like', 'comment', 'follow')
+# Actor ids kept on an aggregated notification, latest first
+RECENT_ACTORS = 3
+
+ACTIONS = {
+    'follow': 'started following you',
+    'like': 'liked your post',
+    'comment': 'commented on your post',
+    'reply': 'replied to your comment',
+}
+
+
+def notification_text(actor_name, actor_count, notification_type):
+    others = actor_count - 1
+    if others == 1:
+        actor_name = f'{actor_name} and 1 other'
+    elif others > 1:
+        actor_name = f'{actor_name} and {others} others'
+    return f'{actor_name} {ACTIONS[notification_type]}'
+
+
+def aggregation_key(recipient_id, notification_type, related_object_id):
+    return f'{recipient_id}:{notification_type}:{related_object_id or ""}'
+
+
+def _open_notification(key, since):
+    existing = Notification.objects.select_for_update().filter(aggregation_key=key).first()
+    if existing is not None and (existing.is_read or existing.created_at < since):
+        # Read or out of the window: close it so the next actor starts a new notification
+        Notification.objects.filter(pk=existing.pk).update(aggregation_key=None)
+        return None
+    return existing
+
+
+def _add_actor(notification, sender):
+    _, created = NotificationActor.objects.get_or_create(notification=notification, actor=sender)
+    if created:
+        # The row is locked, so the count read with it is current; no need to recount the actors
+        Notification.objects.filter(pk=notification.pk).update(actor_count=F('actor_count') + 1)
+        notification.actor_count += 1
+    notification.actor_ids = [sender.id] + [actor_id for actor_id in notification.actor_ids if actor_id != sender.id][:RECENT_ACTORS - 1]
+    notification.sender = sender
+    notification.text = notification_text(sender.username, notification.actor_count, notification.notification_type)
+    notification.created_at = timezone.now()
+    notification.save(update_fields=['sender', 'actor_ids', 'text', 'created_at'])
+    
+    # Still one unread notification, but the client's copy is stale
+    dispatch(notification)
+
+
+def create_notification(recipient, sender, notification_type, related_object_id=None):
+    """
+    Notify ``recipient`` that ``sender`` did something, merging into a recent notification where possible.
+    
+    Likes, comments and follows on the same target are folded into the
+    open unread notification of that kind from the aggregation window:
+    ``sender`` is added to its distinct actors, moves to the front of its
+    recent actors and it moves back to the top of the list. Everything
+    else gets a row of its own. Returns the notification.
+    """
+    fields = {
+        'recipient': recipient,
+        'sender': sender,
+        'notification_type': notification_type,
+        'text': notification_text(sender.username, 1, notification_type),
+        'related_object_id': related_object_id,
+        'actor_ids': [sender.id],
+    }
+    if notification_type not in AGGREGATED_TYPES:
+        return Notification.objects.create(**fields)
+    
+    key = aggregation_key(recipient.id, notification_type, related_object_id)
+    since = timezone.now() - timedelta(seconds=settings.NOTIFICATION_AGGREGATION_WINDOW)
+    with transaction.atomic():
+        existing = _open_notification(key, since)
+        if existing is None:
+            try:
+                with transaction.atomic():
+                    notification = Notification.objects.create(aggregation_key=key, **fields)
+                    NotificationActor.objects.create(notification=notification, actor=sender)
+                return notification
+            except IntegrityError:
+                # Another writer opened the notification first
+                existing = Notification.objects.select_for_update().get(aggregation_key=key)
+        
+        _add_actor(existing, sender)
+        return existing
@@ -2,10 +2,12 @@ import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import User
+from messaging.presence import PresenceMixin
 from .models import Notification
+from .unread import unread_notifications
 
 
-class NotificationConsumer(AsyncWebsocketConsumer):
+class NotificationConsumer(PresenceMixin, AsyncWebsocketConsumer):
     async def connect(self):
         self.user = self.scope["user"]
         if self.user.is_anonymous:
@@ -19,6 +21,9 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             )
             
             await self.accept()
+            
+            # Open on every page, so this socket keeps the user online between conversations
+            await self.track_presence()
     
     async def disconnect(self, close_code):
         # Leave the notification group
@@ -26,10 +31,13 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             self.user_group_name,
             self.channel_name
         )
+        
+        await self.untrack_presence()
     
     async def receive(self, text_data):
         text_data_json = json.loads(text_data)
         action = text_data_json['action']
+        await self.refresh_presence()
         
         if action == 'mark_read':
             notification_id = text_data_json['notification_id']
@@ -40,11 +48,18 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             await self.send(text_data=json.dumps(result))
     
     async def notify(self, event):
-        notification_data = event['notification_data']
-        # Send notification to WebSocket
+        # Send each notification of the batch to WebSocket
+        for notification_data in event['notifications']:
+            await self.send(text_data=json.dumps({
+                'type': 'notification',
+                'notification_data': notification_data
+            }))
+    
+    async def unread_count(self, event):
         await self.send(text_data=json.dumps({
-            'type': 'notification',
-            'notification_data': notification_data
+            'type': 'unread_count',
+            'delta': event['delta'],
+            'unread_count': event['unread_count']
         }))
     
     @database_sync_to_async
@@ -56,7 +71,7 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             return {
                 'status': 'success',
                 'notification_id': notification.id,
-                'unread_count': self.user.notifications.filter(is_read=False).count()
+                'unread_count': unread_notifications.get(self.user.id)
             }
         except Notification.DoesNotExist:
             return {'status': 'error', 'message': 'Notification not found'}
@@ -66,9 +81,7 @@ class NotificationConsumer(AsyncWebsocketConsumer):
     @database_sync_to_async
     def mark_all_notifications_read(self):
         try:
-            unread_notifications = self.user.notifications.filter(is_read=False)
-            for notification in unread_notifications:
-                notification.mark_as_read()
+            Notification.mark_all_read(self.user)
             
             return {
                 'status': 'success',
@@ -0,0 +1,94 @@
+import logging
+import threading
+from collections import defaultdict
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from .models import Notification
+from .targets import resolve_targets
+
+
+logger = logging.getLogger(__name__)
+
+
+def serialize_notification(notification):
+    sender = notification.sender
+    profile = sender.profile
+    return {
+        'id': notification.id,
+        'sender_id': sender.id,
+        'sender_username': sender.username,
+        'sender_avatar': profile.profile_picture.url if profile.profile_picture else None,
+        'notification_type': notification.notification_type,
+        'text': notification.text,
+        'is_read': notification.is_read,
+        'created_at': notification.created_at.strftime('%B %d, %Y, %I:%M %p'),
+        'related_object_id': notification.related_object_id,
+        'actor_count': notification.actor_count,
+        'actor_ids': notification.actor_ids,
+        'target_url': notification.target_url
+    }
+
+
+class NotificationBatch:
+    """Notifications created in one transaction, pushed together once it commits."""
+    
+    def __init__(self):
+        self.notification_ids = []
+    
+    def flush(self):
+        # Reloading by id drops anything rolled back with a savepoint, and joins every sender in one query
+        notifications = Notification.objects.filter(id__in=self.notification_ids).select_related('sender__profile')
+        deliver(resolve_targets(notifications))
+
+
+# Connections are per thread, so are their pending batches
+_batches = threading.local()
+
+
+def dispatch(notification):
+    """
+    Push ``notification`` to its recipient's sockets after the current transaction commits.
+    
+    Every notification created in the same transaction joins one batch,
+    so a commit costs one query however many notifications it carried.
+    Outside a transaction the notification is pushed straight away.
+    """
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        batch = NotificationBatch()
+        batch.notification_ids.append(notification.id)
+        batch.flush()
+        return
+    
+    batch = getattr(_batches, connection.alias, None)
+    pending = batch is not None and any(func == batch.flush for _, func, _ in connection.run_on_commit)
+    if not pending:
+        batch = NotificationBatch()
+        setattr(_batches, connection.alias, batch)
+        transaction.on_commit(batch.flush)
+    batch.notification_ids.append(notification.id)
+
+
+def deliver(notifications):
+    """Serialize each notification once and send one ``notify`` event per recipient."""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    
+    by_recipient = defaultdict(list)
+    for notification in notifications:
+        by_recipient[notification.recipient_id].append(serialize_notification(notification))
+    
+    for recipient_id, notification_data in by_recipient.items():
+        try:
+            async_to_sync(channel_layer.group_send)(
+                f'notifications_{recipient_id}',
+                {
+                    'type': 'notify',
+                    'notifications': notification_data
+                }
+            )
+        except Exception:
+            # Stored already; the client sees it next time it loads notifications
+            logger.exception('Failed to push %d notification(s) to user %s', len(notification_data), recipient_id)
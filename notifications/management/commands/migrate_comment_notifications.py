@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from blog.models import Comment
+from notifications.models import Notification, NotificationActor
+
+
+class Command(BaseCommand):
+    help = 'Point comment notifications stored before aggregation at their post instead of the comment'
+    
+    def handle(self, *args, **options):
+        # Notifications made by create_notification always have actor rows; older comment
+        # notifications have none and still hold the comment's id
+        legacy = list(Notification.objects.filter(notification_type='comment', actors__isnull=True))
+        post_ids = dict(
+            Comment.objects.filter(id__in={n.related_object_id for n in legacy if n.related_object_id})
+            .values_list('id', 'post_id')
+        )
+        
+        for notification in legacy:
+            notification.related_object_id = post_ids.get(notification.related_object_id)
+        
+        with transaction.atomic():
+            Notification.objects.bulk_update(legacy, ['related_object_id'], batch_size=1000)
+            # Recording the sender as an actor also marks the row as migrated
+            NotificationActor.objects.bulk_create(
+                [NotificationActor(notification=notification, actor_id=notification.sender_id) for notification in legacy],
+                batch_size=1000,
+                ignore_conflicts=True,
+            )
+        
+        orphaned = sum(1 for notification in legacy if notification.related_object_id is None)
+        self.stdout.write(self.style.SUCCESS(
+            f'Migrated {len(legacy)} comment notification(s) ({orphaned} pointed at deleted comments)'
+        ))
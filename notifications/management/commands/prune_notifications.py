@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+from notifications.retention import PRUNE_CHUNK_SIZE, prune_notifications
+
+
+class Command(BaseCommand):
+    help = 'Delete notifications older than their retention period (NOTIFICATION_RETENTION_DAYS) in small chunks'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=PRUNE_CHUNK_SIZE,
+                            help='Rows deleted per transaction')
+        parser.add_argument('--pause', type=float, default=0,
+                            help='Seconds to sleep between chunks')
+    
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        pruned = prune_notifications(chunk_size=options['chunk_size'], pause=options['pause'])
+        elapsed = time.perf_counter() - started
+        
+        for (notification_type, is_read), total in pruned.items():
+            self.stdout.write(f'  {notification_type} ({"read" if is_read else "unread"}): {total}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Pruned {sum(pruned.values())} notification(s) in {elapsed:.2f}s'
+        ))
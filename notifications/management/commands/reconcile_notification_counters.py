@@ -0,0 +1,32 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+from notifications.models import NotificationCounter
+from notifications.unread import unread_notifications
+
+
+class Command(BaseCommand):
+    help = 'Recompute every user\'s stored unread notification counter from the notifications themselves'
+    
+    def handle(self, *args, **options):
+        totals = User.objects.annotate(
+            unread=Count('notifications', filter=Q(notifications__is_read=False))
+        ).values_list('id', 'unread')
+        counters = [NotificationCounter(user_id=user_id, unread_count=unread) for user_id, unread in totals]
+        
+        with transaction.atomic():
+            stored = dict(NotificationCounter.objects.values_list('user_id', 'unread_count'))
+            drifted = sum(1 for counter in counters if stored.get(counter.user_id, 0) != counter.unread_count)
+            NotificationCounter.objects.bulk_create(
+                counters,
+                update_conflicts=True,
+                unique_fields=['user'],
+                update_fields=['unread_count'],
+            )
+        cache.delete_many([unread_notifications.key(counter.user_id) for counter in counters])
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Reconciled {len(counters)} notification counter(s) ({drifted} had drifted)'
+        ))
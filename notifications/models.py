@@ -1,7 +1,17 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.urls import reverse
 from django.contrib.auth.models import User
 
 
+# Notification types whose ``related_object_id`` is a post, and a comment
+POST_TARGET_TYPES = ('like', 'comment')
+COMMENT_TARGET_TYPES = ('reply',)
+
+
 class Notification(models.Model):
     NOTIFICATION_TYPES = (
         ('follow', 'Follow'),
@@ -15,23 +25,52 @@ class Notification(models.Model):
     notification_type = models.CharField(max_length=10, choices=NOTIFICATION_TYPES)
     text = models.CharField(max_length=255)
     related_object_id = models.PositiveIntegerField(null=True, blank=True)
+    # Aggregated notifications stand for several actors; ``sender`` is the latest of them
+    actor_count = models.PositiveIntegerField(default=1)
+    actor_ids = models.JSONField(default=list, blank=True)
+    # Set while the notification still takes new actors; unique, so concurrent
+    # writers cannot open two notifications for the same target
+    aggregation_key = models.CharField(max_length=64, unique=True, null=True, blank=True)
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipient', 'notification_type', 'related_object_id', '-created_at'], name='notifications_aggregate_idx'),
+            models.Index(fields=['recipient', 'is_read', '-created_at'], name='notifications_unread_idx'),
+            models.Index(fields=['recipient', '-created_at', '-id'], name='notifications_recent_idx'),
+            models.Index(fields=['notification_type', 'is_read', 'created_at'], name='notifications_prune_idx'),
+        ]
     
     def __str__(self):
         return f'Notification for {self.recipient.username}: {self.text}'
     
     def mark_as_read(self):
         if not self.is_read:
+            with transaction.atomic():
+                # Conditional, so a concurrent read of the same notification is only counted once
+                if Notification.objects.filter(id=self.id, is_read=False).update(is_read=True):
+                    NotificationCounter.add(self.recipient_id, -1)
             self.is_read = True
-            self.save()
+    
+    @classmethod
+    def mark_all_read(cls, user):
+        """Mark every unread notification of ``user`` read with one set-based UPDATE. Returns how many changed."""
+        with transaction.atomic():
+            updated = cls.objects.filter(recipient=user, is_read=False).update(is_read=True)
+            NotificationCounter.add(user.id, -updated)
+        return updated
+    
+    # Set on whole pages at once by ``targets.resolve_targets``; looked up one by one otherwise
+    _related_post = _related_comment = None
+    _targets_resolved = False
     
     @property
     def related_post(self):
-        if self.notification_type in ['like', 'comment'] and self.related_object_id:
+        if self._targets_resolved:
+            return self._related_post
+        if self.notification_type in POST_TARGET_TYPES and self.related_object_id:
             from blog.models import Post
             try:
                 return Post.objects.get(id=self.related_object_id)
@@ -41,10 +80,92 @@ class Notification(models.Model):
     
     @property
     def related_comment(self):
-        if self.notification_type == 'reply' and self.related_object_id:
+        if self._targets_resolved:
+            return self._related_comment
+        if self.notification_type in COMMENT_TARGET_TYPES and self.related_object_id:
             from blog.models import Comment
             try:
                 return Comment.objects.get(id=self.related_object_id)
             except Comment.DoesNotExist:
                 return None
-        return None
\ No newline at end of file
+        return None
+    
+    @property
+    def target_url(self):
+        if self.notification_type == 'follow':
+            return reverse('accounts:profile', args=[self.sender.username])
+        post = self.related_post
+        if post is not None:
+            return post.get_absolute_url() + ('#comments' if self.notification_type == 'comment' else '')
+        comment = self.related_comment
+        if comment is not None:
+            return f'{comment.post.get_absolute_url()}#comment-{comment.id}'
+        return None
+
+
+class NotificationActor(models.Model):
+    """A distinct user folded into an aggregated notification."""
+    notification = models.ForeignKey(Notification, related_name='actors', on_delete=models.CASCADE)
+    actor = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    
+    class Meta:
+        unique_together = ('notification', 'actor')
+    
+    def __str__(self):
+        return f'User {self.actor_id} on notification {self.notification_id}'
+
+
+class NotificationCounter(models.Model):
+    """A user's unread notification count, updated in the same transaction as the notifications it counts."""
+    user = models.OneToOneField(User, primary_key=True, related_name='notification_counter', on_delete=models.CASCADE)
+    unread_count = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f'{self.unread_count} unread notifications for user {self.user_id}'
+    
+    @classmethod
+    def add(cls, user_id, delta):
+        """
+        Add ``delta`` to a user's stored count with one ``F()`` UPDATE and
+        queue the matching cached counter update for commit.
+        """
+        if not delta:
+            return
+        
+        from .unread import unread_notifications
+        unread_notifications.adjust(user_id, delta)
+        
+        if cls.objects.filter(user_id=user_id).update(unread_count=Greatest(F('unread_count') + delta, 0)):
+            return
+        if delta < 0:
+            return
+        
+        try:
+            with transaction.atomic():
+                cls.objects.create(user_id=user_id, unread_count=delta)
+        except IntegrityError:
+            # Another writer created the row first
+            cls.objects.filter(user_id=user_id).update(unread_count=F('unread_count') + delta)
+    
+    @classmethod
+    def unread_for(cls, user_id):
+        return cls.objects.filter(user_id=user_id).values_list('unread_count', flat=True).first() or 0
+
+
+@receiver(post_save, sender=Notification)
+def count_new_notification(sender, instance, created, **kwargs):
+    if created and not instance.is_read:
+        NotificationCounter.add(instance.recipient_id, 1)
+
+
+@receiver(post_save, sender=Notification)
+def dispatch_new_notification(sender, instance, created, **kwargs):
+    if created:
+        from .dispatch import dispatch
+        dispatch(instance)
+
+
+@receiver(post_delete, sender=Notification)
+def uncount_deleted_notification(sender, instance, **kwargs):
+    if not instance.is_read:
+        NotificationCounter.add(instance.recipient_id, -1)
@@ -0,0 +1,76 @@
+import time
+from collections import Counter
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import Notification, NotificationActor, NotificationCounter
+
+
+PRUNE_CHUNK_SIZE = 1000
+
+
+def retention_cutoffs(now=None):
+    """Yield ``(notification_type, is_read, cutoff)`` for every configured retention period."""
+    now = now or timezone.now()
+    for notification_type, periods in settings.NOTIFICATION_RETENTION_DAYS.items():
+        for state, is_read in (('read', True), ('unread', False)):
+            days = periods.get(state)
+            if days is not None:
+                yield notification_type, is_read, now - timedelta(days=days)
+
+
+def _delete_chunk(expired, chunk_size, is_read):
+    table = connection.ops.quote_name(Notification._meta.db_table)
+    with transaction.atomic():
+        rows = list(expired.select_for_update()[:chunk_size])
+        if not rows:
+            return 0, 0
+        selected = len(rows)
+        ids = [notification_id for notification_id, _ in rows]
+        # The raw DELETE below skips Django's cascade, so clear the aggregated actors first
+        NotificationActor.objects.filter(notification_id__in=ids, notification__is_read=is_read).delete()
+        # A plain DELETE by primary key: no rows loaded and no per-row signals. The read
+        # state is checked again in case the row was marked read since it was selected
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {table} WHERE id IN ({', '.join(['%s'] * len(ids))}) AND is_read = %s",
+                ids + [is_read]
+            )
+            deleted = cursor.rowcount
+        if deleted < len(rows):
+            survivors = set(Notification.objects.filter(id__in=ids).values_list('id', flat=True))
+            rows = [row for row in rows if row[0] not in survivors]
+        if not is_read:
+            for recipient_id, total in Counter(recipient_id for _, recipient_id in rows).items():
+                NotificationCounter.add(recipient_id, -total)
+    return selected, len(rows)
+
+
+def prune_notifications(chunk_size=PRUNE_CHUNK_SIZE, pause=0, now=None):
+    """
+    Delete notifications past their retention period, ``chunk_size`` rows per transaction.
+    
+    Each chunk is locked oldest first off the retention index and deleted
+    in its own short transaction, so no lock is held for longer than one
+    chunk; ``pause`` seconds between chunks leave room for other writers.
+    Only the rows actually deleted come off their recipients' unread
+    counters, in the same transaction. Returns
+    ``{(notification_type, is_read): rows pruned}``.
+    """
+    pruned = {}
+    for notification_type, is_read, cutoff in retention_cutoffs(now):
+        expired = Notification.objects.filter(
+            notification_type=notification_type, is_read=is_read, created_at__lt=cutoff
+        ).order_by('created_at').values_list('id', 'recipient_id')
+        
+        total = 0
+        while True:
+            selected, deleted = _delete_chunk(expired, chunk_size, is_read)
+            if not selected:
+                break
+            total += deleted
+            if pause:
+                time.sleep(pause)
+        pruned[notification_type, is_read] = total
+    return pruned
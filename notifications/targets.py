@@ -0,0 +1,39 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from .models import COMMENT_TARGET_TYPES, POST_TARGET_TYPES, Notification
+
+
+def resolve_targets(notifications):
+    """
+    Load what a page of notifications points at, one query per kind of target.
+    
+    Fills in every notification's ``related_post`` or ``related_comment``
+    (with its post) and, unless already joined, its sender with profile,
+    so templates and serializers can follow them without a query per row.
+    Returns the notifications as a list.
+    """
+    from blog.models import Comment, Post
+    
+    notifications = list(notifications)
+    post_ids = {n.related_object_id for n in notifications if n.notification_type in POST_TARGET_TYPES and n.related_object_id}
+    comment_ids = {n.related_object_id for n in notifications if n.notification_type in COMMENT_TARGET_TYPES and n.related_object_id}
+    sender_ids = {n.sender_id for n in notifications if not Notification.sender.is_cached(n)}
+    
+    posts = Post.objects.in_bulk(post_ids) if post_ids else {}
+    comments = Comment.objects.select_related('post').in_bulk(comment_ids) if comment_ids else {}
+    senders = User.objects.select_related('profile').in_bulk(sender_ids) if sender_ids else {}
+    
+    for notification in notifications:
+        if notification.sender_id in senders:
+            notification.sender = senders[notification.sender_id]
+        if notification.notification_type in POST_TARGET_TYPES:
+            notification._related_post = posts.get(notification.related_object_id)
+        elif notification.notification_type in COMMENT_TARGET_TYPES:
+            notification._related_comment = comments.get(notification.related_object_id)
+        notification._targets_resolved = True
+    return notifications
+
+
+async def aresolve_targets(notifications):
+    """Async version of ``resolve_targets`` for async views."""
+    return await sync_to_async(resolve_targets)(notifications)
@@ -1,6 +1,21 @@
-from django.test import TestCase
+import asyncio
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
 from django.contrib.auth.models import User
-from .models import Notification
+from django.urls import reverse
+from .models import Notification, NotificationActor, NotificationCounter
+from .unread import unread_notifications
+from .aggregation import create_notification
+from .targets import resolve_targets
+from .retention import _delete_chunk, prune_notifications
 
 
 class NotificationModelTest(TestCase):
@@ -74,4 +89,299 @@ class NotificationModelTest(TestCase):
             related_object_id=comment.id
         )
         
-        self.assertEqual(reply_notification.related_comment, comment)
\ No newline at end of file
+        self.assertEqual(reply_notification.related_comment, comment)
+
+
+class NotificationApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user1 = User.objects.create_user(username='user1', password='testpass')
+        self.user2 = User.objects.create_user(username='user2', password='testpass')
+        for i in range(7):
+            Notification.objects.create(
+                recipient=self.user1,
+                sender=self.user2,
+                notification_type='follow',
+                text=f'Notification {i}',
+                is_read=i < 2
+            )
+    
+    def test_unread_count(self):
+        self.client.login(username='user1', password='testpass')
+        response = self.client.get(reverse('notifications:api_unread_count'))
+        self.assertEqual(response.json(), {'unread_count': 5})
+    
+    def test_counter_follows_writes(self):
+        self.assertEqual(unread_notifications.get(self.user1.id), 5)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            notification = Notification.objects.create(
+                recipient=self.user1, sender=self.user2, notification_type='follow', text='New'
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            notification.mark_as_read()
+            Notification.objects.filter(is_read=False).first().delete()
+        
+        with self.assertNumQueries(0):
+            self.assertEqual(unread_notifications.get(self.user1.id), 4)
+    
+    def test_recent_notifications(self):
+        self.client.login(username='user1', password='testpass')
+        response = self.client.get(reverse('notifications:api_recent_notifications'))
+        notifications = response.json()['notifications']
+        
+        self.assertEqual(len(notifications), 5)
+        self.assertEqual(notifications[0]['text'], 'Notification 6')
+        self.assertEqual(notifications[0]['sender_username'], 'user2')
+
+
+class NotificationCounterTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user1 = User.objects.create_user(username='user1', password='testpass')
+        self.user2 = User.objects.create_user(username='user2', password='testpass')
+        Notification.objects.bulk_create([
+            Notification(recipient=self.user1, sender=self.user2, notification_type='follow', text=f'Notification {i}')
+            for i in range(50)
+        ])
+        call_command('reconcile_notification_counters', stdout=StringIO())
+    
+    def test_counter_is_read_without_counting(self):
+        Notification.objects.create(recipient=self.user1, sender=self.user2, notification_type='follow', text='One more')
+        with self.assertNumQueries(1):
+            self.assertEqual(unread_notifications.compute(self.user1.id), 51)
+    
+    def test_mark_all_read_is_set_based(self):
+        # The notifications UPDATE and the counter UPDATE, inside one savepoint
+        with self.assertNumQueries(4):
+            self.assertEqual(Notification.mark_all_read(self.user1), 50)
+        
+        self.assertFalse(self.user1.notifications.filter(is_read=False).exists())
+        self.assertEqual(NotificationCounter.unread_for(self.user1.id), 0)
+    
+    def test_mark_as_read_counts_once(self):
+        notification = self.user1.notifications.first()
+        notification.mark_as_read()
+        Notification.objects.get(id=notification.id).mark_as_read()
+        notification.delete()
+        
+        self.assertEqual(NotificationCounter.unread_for(self.user1.id), 49)
+
+
+class NotificationTargetTest(TestCase):
+    def setUp(self):
+        from blog.models import Comment, Post
+        self.user1 = User.objects.create_user(username='user1', password='testpass')
+        self.user2 = User.objects.create_user(username='user2', password='testpass')
+        self.posts = [Post.objects.create(title=f'Post {i}', content='Content', author=self.user1) for i in range(3)]
+        self.comment = Comment.objects.create(post=self.posts[0], author=self.user1, content='Comment')
+        for post in self.posts:
+            Notification.objects.create(recipient=self.user1, sender=self.user2, notification_type='like', text='Like', related_object_id=post.id)
+        Notification.objects.create(recipient=self.user1, sender=self.user2, notification_type='reply', text='Reply', related_object_id=self.comment.id)
+        Notification.objects.create(recipient=self.user1, sender=self.user2, notification_type='follow', text='Follow')
+        Notification.objects.create(recipient=self.user1, sender=self.user2, notification_type='like', text='Gone', related_object_id=0)
+    
+    def test_resolves_a_page_in_one_query_per_type(self):
+        # Posts, comments with their posts, and senders with profiles
+        with self.assertNumQueries(4):
+            notifications = resolve_targets(self.user1.notifications.all())
+        
+        with self.assertNumQueries(0):
+            targets = {notification.text: notification.target_url for notification in notifications if notification.text != 'Like'}
+            liked = {notification.related_post for notification in notifications if notification.text == 'Like'}
+            avatars = [notification.sender.profile.profile_picture for notification in notifications]
+        
+        self.assertEqual(liked, set(self.posts))
+        self.assertEqual(targets['Reply'], f'{self.posts[0].get_absolute_url()}#comment-{self.comment.id}')
+        self.assertEqual(targets['Follow'], reverse('accounts:profile', args=['user2']))
+        self.assertIsNone(targets['Gone'])
+        self.assertEqual(len(avatars), 6)
+    
+    def test_migrates_legacy_comment_targets(self):
+        from blog.models import Comment
+        comment = Comment.objects.create(post=self.posts[2], author=self.user2, content='Comment')
+        legacy = Notification.objects.create(recipient=self.user1, sender=self.user2, notification_type='comment', text='Legacy', related_object_id=comment.id)
+        current = create_notification(self.user1, self.user2, 'comment', self.posts[1].id)
+        
+        for _ in range(2):
+            call_command('migrate_comment_notifications', stdout=StringIO())
+        
+        legacy.refresh_from_db()
+        current.refresh_from_db()
+        self.assertEqual(legacy.related_post, self.posts[2])
+        self.assertEqual(current.related_post, self.posts[1])
+        self.assertEqual(legacy.actors.count(), 1)
+
+
+class NotificationRetentionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user1 = User.objects.create_user(username='user1', password='testpass')
+        self.user2 = User.objects.create_user(username='user2', password='testpass')
+    
+    def create(self, notification_type, is_read, days_old):
+        notification = Notification.objects.create(
+            recipient=self.user1, sender=self.user2, notification_type=notification_type, text='Text', is_read=is_read
+        )
+        Notification.objects.filter(id=notification.id).update(created_at=timezone.now() - timedelta(days=days_old))
+        return notification
+    
+    @override_settings(NOTIFICATION_RETENTION_DAYS={'like': {'read': 30, 'unread': 90}, 'follow': {'read': None}})
+    def test_prunes_expired_notifications(self):
+        for _ in range(3):
+            self.create('like', True, 40)
+            self.create('like', False, 100)
+        kept = [self.create('like', True, 10), self.create('like', False, 40), self.create('follow', True, 1000)]
+        
+        out = StringIO()
+        call_command('prune_notifications', chunk_size=2, stdout=out)
+        
+        self.assertEqual(set(Notification.objects.all()), set(kept))
+        self.assertEqual(NotificationCounter.unread_for(self.user1.id), 1)
+        self.assertIn('Pruned 6 notification(s)', out.getvalue())
+    
+    @override_settings(NOTIFICATION_RETENTION_DAYS={'like': {'unread': 90}})
+    def test_prunes_aggregated_notifications(self):
+        expired = create_notification(self.user1, self.user2, 'like', 7)
+        create_notification(self.user1, self.user1, 'like', 7)
+        Notification.objects.filter(id=expired.id).update(created_at=timezone.now() - timedelta(days=100))
+        kept = create_notification(self.user1, self.user2, 'like', 8)
+        
+        self.assertEqual(prune_notifications(chunk_size=2)['like', False], 1)
+        self.assertEqual(list(Notification.objects.all()), [kept])
+        self.assertEqual(NotificationActor.objects.filter(notification=expired).count(), 0)
+        self.assertEqual(NotificationCounter.unread_for(self.user1.id), 1)
+    
+    def test_skips_rows_read_since_selection(self):
+        stale = self.create('like', False, 100)
+        fresh = self.create('like', False, 100)
+        stale.mark_as_read()
+        
+        # The chunk was chosen as unread; the DELETE re-checks the read state
+        chosen = Notification.objects.filter(id__in=[stale.id, fresh.id]).values_list('id', 'recipient_id')
+        self.assertEqual(_delete_chunk(chosen, 10, False), (2, 1))
+        
+        self.assertEqual(list(Notification.objects.all()), [stale])
+        self.assertEqual(NotificationCounter.unread_for(self.user1.id), 0)
+
+
+class NotificationAggregationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='testpass')
+        self.fans = [User.objects.create_user(username=f'fan{i}', password='testpass') for i in range(5)]
+    
+    def test_merges_actors_on_the_same_target(self):
+        for fan in self.fans:
+            notification = create_notification(self.author, fan, 'like', 7)
+        create_notification(self.author, self.fans[2], 'like', 7)
+        
+        self.assertEqual(self.author.notifications.count(), 1)
+        notification.refresh_from_db()
+        self.assertEqual(notification.actor_count, 5)
+        self.assertEqual(notification.actor_ids, [self.fans[2].id, self.fans[4].id, self.fans[3].id])
+        self.assertEqual(notification.sender, self.fans[2])
+        self.assertEqual(notification.text, 'fan2 and 4 others liked your post')
+        self.assertEqual(unread_notifications.get(self.author.id), 1)
+    
+    def test_keeps_separate_rows(self):
+        create_notification(self.author, self.fans[0], 'like', 7)
+        create_notification(self.author, self.fans[1], 'like', 8)
+        create_notification(self.author, self.fans[0], 'reply', 1)
+        create_notification(self.author, self.fans[1], 'reply', 2)
+        
+        # Once read, the next like starts a new notification
+        self.author.notifications.update(is_read=True)
+        latest = create_notification(self.author, self.fans[2], 'like', 7)
+        
+        self.assertEqual(self.author.notifications.count(), 5)
+        self.assertEqual(latest.text, 'fan2 liked your post')
+    
+    def test_counts_each_actor_once(self):
+        for fan in self.fans + self.fans[:2]:
+            notification = create_notification(self.author, fan, 'like', 7)
+        
+        # fan0 and fan1 had dropped out of the recent actors but are still only counted once
+        self.assertEqual(notification.actor_count, 5)
+        self.assertEqual(notification.actors.count(), 5)
+        self.assertEqual(notification.text, 'fan1 and 4 others liked your post')
+    
+    def test_one_open_notification_per_target(self):
+        create_notification(self.author, self.fans[0], 'like', 7)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Notification.objects.create(
+                recipient=self.author,
+                sender=self.fans[1],
+                notification_type='like',
+                text='Duplicate',
+                related_object_id=7,
+                aggregation_key=f'{self.author.id}:like:7'
+            )
+        
+        # A writer that missed the open notification merges into it instead of failing
+        with mock.patch('notifications.aggregation._open_notification', return_value=None):
+            notification = create_notification(self.author, self.fans[1], 'like', 7)
+        self.assertEqual(self.author.notifications.count(), 1)
+        self.assertEqual(notification.actor_count, 2)
+
+
+class NotificationDispatchTest(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username='user1', password='testpass')
+        self.user2 = User.objects.create_user(username='user2', password='testpass')
+        self.channel_layer = get_channel_layer()
+        self.channel = async_to_sync(self.channel_layer.new_channel)()
+        async_to_sync(self.channel_layer.group_add)(f'notifications_{self.user1.id}', self.channel)
+    
+    def test_pushes_one_batch_per_transaction(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                for i in range(3):
+                    Notification.objects.create(
+                        recipient=self.user1, sender=self.user2, notification_type='follow', text=f'Notification {i}'
+                    )
+                
+                # Rolled back with its savepoint, so never pushed
+                with self.assertRaises(ValueError), transaction.atomic():
+                    Notification.objects.create(
+                        recipient=self.user1, sender=self.user2, notification_type='follow', text='Rolled back'
+                    )
+                    raise ValueError
+        
+        # Three unread counter updates and a single notify carrying the batch
+        events = [async_to_sync(self.channel_layer.receive)(self.channel) for _ in range(4)]
+        notify_events = [event for event in events if event['type'] == 'notify']
+        self.assertEqual(len(notify_events), 1)
+        event = notify_events[0]
+        self.assertEqual(
+            [data['text'] for data in event['notifications']],
+            ['Notification 2', 'Notification 1', 'Notification 0']
+        )
+        self.assertEqual(event['notifications'][0]['sender_username'], 'user2')
+
+
+class AutocommitDispatchTest(TransactionTestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username='user1', password='testpass')
+        self.user2 = User.objects.create_user(username='user2', password='testpass')
+        self.channel_layer = get_channel_layer()
+        self.channel = async_to_sync(self.channel_layer.new_channel)()
+        async_to_sync(self.channel_layer.group_add)(f'notifications_{self.user1.id}', self.channel)
+    
+    def test_pushes_straight_away_outside_a_transaction(self):
+        notification = Notification.objects.create(
+            recipient=self.user1, sender=self.user2, notification_type='follow', text='Follow'
+        )
+        
+        delivered = [data['id'] for event in self.drain() if event['type'] == 'notify' for data in event['notifications']]
+        self.assertEqual(delivered, [notification.id])
+    
+    def drain(self):
+        async def receive_all():
+            events = []
+            while True:
+                try:
+                    events.append(await asyncio.wait_for(self.channel_layer.receive(self.channel), 0.2))
+                except asyncio.TimeoutError:
+                    return events
+        return async_to_sync(receive_all)()
@@ -0,0 +1,11 @@
+from storyverse.counters import UnreadCounter
+from .models import NotificationCounter
+
+
+def count_unread_notifications(user_id):
+    # The stored counter, so a cache miss is a primary key read rather than a COUNT
+    return NotificationCounter.unread_for(user_id)
+
+
+# Pushed to NotificationConsumer through the user's notification group
+unread_notifications = UnreadCounter('unread_notifications', 'notifications_{user_id}', count_unread_notifications)
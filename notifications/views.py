@@ -2,42 +2,42 @@ from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
+from storyverse.decorators import async_login_required
+from storyverse.pagination import paginate_by_cursor
 from .models import Notification
+from .unread import unread_notifications
+from .dispatch import serialize_notification
+from .targets import aresolve_targets, resolve_targets
+
+
+NOTIFICATIONS_PER_PAGE = 20
 
 
 @login_required
 def notifications_view(request):
-    notifications = request.user.notifications.all()
+    # One page at a time, with senders joined and every link target loaded in bulk
+    page = paginate_by_cursor(
+        request.user.notifications.select_related('sender__profile'), request.GET.get('cursor'), NOTIFICATIONS_PER_PAGE
+    )
     
     return render(request, 'notifications/notifications.html', {
-        'notifications': notifications
+        'notifications': resolve_targets(page),
+        'page_obj': page
     })
 
 
-@login_required
-def api_unread_count(request):
-    unread_count = request.user.notifications.filter(is_read=False).count()
+@async_login_required
+async def api_unread_count(request):
+    unread_count = await unread_notifications.aget(request.user.id)
     return JsonResponse({'unread_count': unread_count})
 
 
-@login_required
-def api_recent_notifications(request):
+@async_login_required
+async def api_recent_notifications(request):
     # Get 5 most recent notifications
-    notifications = request.user.notifications.all()[:5]
+    notifications = await aresolve_targets(request.user.notifications.select_related('sender__profile')[:5])
     
-    notification_data = []
-    for notification in notifications:
-        notification_data.append({
-            'id': notification.id,
-            'sender_id': notification.sender.id,
-            'sender_username': notification.sender.username,
-            'sender_avatar': notification.sender.profile.profile_picture.url if notification.sender.profile.profile_picture else None,
-            'notification_type': notification.notification_type,
-            'text': notification.text,
-            'is_read': notification.is_read,
-            'created_at': notification.created_at.strftime('%B %d, %Y, %I:%M %p'),
-            'related_object_id': notification.related_object_id
-        })
+    notification_data = [serialize_notification(notification) for notification in notifications]
     
     return JsonResponse({'notifications': notification_data})
 
@@ -52,7 +52,7 @@ def api_mark_read(request, notification_id):
         return JsonResponse({
             'status': 'success',
             'notification_id': notification.id,
-            'unread_count': request.user.notifications.filter(is_read=False).count()
+            'unread_count': unread_notifications.get(request.user.id)
         })
     except Notification.DoesNotExist:
         return JsonResponse({'status': 'error', 'message': 'Notification not found'})
@@ -64,9 +64,7 @@ def api_mark_read(request, notification_id):
 @require_POST
 def api_mark_all_read(request):
     try:
-        unread_notifications = request.user.notifications.filter(is_read=False)
-        for notification in unread_notifications:
-            notification.mark_as_read()
+        Notification.mark_all_read(request.user)
         
         return JsonResponse({
             'status': 'success',
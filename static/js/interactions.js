@@ -15,6 +15,12 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Initialize follower/following modals
     initFollowerModals();
+    
+    // Initialize infinite scroll on post listings
+    initInfiniteFeed();
+    
+    // Initialize comment thread paging
+    initCommentPaging();
 });
 
 // Initialize follow buttons
@@ -116,18 +122,23 @@ function initLikeButtons() {
     const likeButtons = document.querySelectorAll('.like-btn');
     
     likeButtons.forEach(button => {
-        button.addEventListener('click', function(e) {
-            e.preventDefault();
-            
-            const postId = this.getAttribute('data-post-id');
-            const isLiked = this.getAttribute('data-liked') === 'true';
-            
-            if (isLiked) {
-                unlikePost(postId, this);
-            } else {
-                likePost(postId, this);
-            }
-        });
+        bindLikeButton(button);
+    });
+}
+
+// Attach the like/unlike handler to a single button
+function bindLikeButton(button) {
+    button.addEventListener('click', function(e) {
+        e.preventDefault();
+        
+        const postId = this.getAttribute('data-post-id');
+        const isLiked = this.getAttribute('data-liked') === 'true';
+        
+        if (isLiked) {
+            unlikePost(postId, this);
+        } else {
+            likePost(postId, this);
+        }
     });
 }
 
@@ -396,6 +407,154 @@ function initReplyButtons() {
     });
 }
 
+// Initialize "load more" buttons for comment threads and replies
+function initCommentPaging() {
+    const loadMoreComments = document.getElementById('load-more-comments');
+    if (loadMoreComments) {
+        loadMoreComments.addEventListener('click', function() {
+            const button = this;
+            const url = `${button.getAttribute('data-url')}?cursor=${encodeURIComponent(button.getAttribute('data-cursor'))}`;
+            
+            fetch(url, { method: 'GET', credentials: 'same-origin' })
+            .then(response => response.json())
+            .then(data => {
+                const commentsContainer = document.getElementById('comments-container');
+                data.threads.forEach(thread => {
+                    const threadElement = createCommentThread(thread);
+                    commentsContainer.appendChild(threadElement);
+                    bindLoadRepliesButton(threadElement.querySelector('.load-replies-btn'));
+                });
+                
+                if (data.next_cursor) {
+                    button.setAttribute('data-cursor', data.next_cursor);
+                } else {
+                    button.remove();
+                }
+            })
+            .catch(error => {
+                console.error('Error loading comments:', error);
+                showToast('An error occurred', 'error');
+            });
+        });
+    }
+    
+    document.querySelectorAll('.load-replies-btn').forEach(button => {
+        bindLoadRepliesButton(button);
+    });
+}
+
+// Attach the "more replies" handler to a single button
+function bindLoadRepliesButton(button) {
+    if (!button) {
+        return;
+    }
+    
+    button.addEventListener('click', function() {
+        const commentId = button.getAttribute('data-comment-id');
+        const cursor = button.getAttribute('data-cursor');
+        
+        fetch(`/api/comment/${commentId}/replies/?cursor=${encodeURIComponent(cursor)}`, {
+            method: 'GET',
+            credentials: 'same-origin',
+        })
+        .then(response => response.json())
+        .then(data => {
+            const comment = document.querySelector(`.comment[data-comment-id="${commentId}"]`);
+            const repliesContainer = comment ? comment.querySelector('.replies-container') : null;
+            if (repliesContainer) {
+                data.replies.forEach(reply => {
+                    repliesContainer.appendChild(createReplyElement(reply));
+                });
+            }
+            
+            if (data.next_cursor) {
+                button.setAttribute('data-cursor', data.next_cursor);
+            } else {
+                button.remove();
+            }
+        })
+        .catch(error => {
+            console.error('Error loading replies:', error);
+            showToast('An error occurred', 'error');
+        });
+    });
+}
+
+// Create a top-level comment with its loaded replies
+function createCommentThread(thread) {
+    const commentElement = document.createElement('div');
+    commentElement.className = 'comment bg-white dark:bg-gray-800 rounded-lg shadow-md p-6';
+    commentElement.setAttribute('data-comment-id', thread.id);
+    const author = escapeHtml(thread.author);
+    
+    commentElement.innerHTML = `
+        <div class="flex items-start">
+            <div class="flex-shrink-0 mr-4">
+                ${thread.avatar ? 
+                    `<img src="${escapeHtml(thread.avatar)}" alt="${author}" class="w-10 h-10 rounded-full object-cover">` :
+                    `<div class="w-10 h-10 rounded-full bg-gray-300 dark:bg-gray-600 flex items-center justify-center">
+                        <span class="text-gray-600 dark:text-gray-300 font-medium">${escapeHtml(thread.author.charAt(0).toUpperCase())}</span>
+                    </div>`
+                }
+            </div>
+            <div class="flex-1">
+                <div class="bg-gray-100 dark:bg-gray-700 rounded-lg p-4">
+                    <div class="flex items-center justify-between mb-1">
+                        <a href="/accounts/profile/${escapeHtml(encodeURIComponent(thread.author))}/" class="font-medium text-gray-900 dark:text-white hover:text-blue-600 dark:hover:text-blue-400 transition">${author}</a>
+                        <span class="text-xs text-gray-500 dark:text-gray-400">${escapeHtml(thread.created_at)}</span>
+                    </div>
+                    <p class="text-gray-800 dark:text-gray-200">${escapeHtml(thread.content)}</p>
+                </div>
+            </div>
+        </div>
+        <div class="replies-container mt-4 ml-14"></div>
+        ${thread.replies_cursor ? 
+            `<button class="load-replies-btn mt-2 ml-14 text-sm text-blue-600 dark:text-blue-400 hover:underline" data-comment-id="${thread.id}" data-cursor="${escapeHtml(thread.replies_cursor)}">
+                View more replies (${thread.reply_count} total)
+            </button>` : 
+            ''
+        }
+    `;
+    
+    const repliesContainer = commentElement.querySelector('.replies-container');
+    thread.replies.forEach(reply => {
+        repliesContainer.appendChild(createReplyElement(reply));
+    });
+    
+    return commentElement;
+}
+
+// Create a reply element
+function createReplyElement(reply) {
+    const replyElement = document.createElement('div');
+    replyElement.className = 'reply mb-4 pl-4 border-l-2 border-gray-200 dark:border-gray-700';
+    const author = escapeHtml(reply.author);
+    
+    replyElement.innerHTML = `
+        <div class="flex items-start">
+            <div class="flex-shrink-0 mr-3">
+                ${reply.avatar ? 
+                    `<img src="${escapeHtml(reply.avatar)}" alt="${author}" class="w-8 h-8 rounded-full object-cover">` :
+                    `<div class="w-8 h-8 rounded-full bg-gray-300 dark:bg-gray-600 flex items-center justify-center">
+                        <span class="text-gray-600 dark:text-gray-300 text-xs">${escapeHtml(reply.author.charAt(0).toUpperCase())}</span>
+                    </div>`
+                }
+            </div>
+            <div class="flex-1">
+                <div class="bg-gray-100 dark:bg-gray-700 rounded-lg p-3">
+                    <div class="flex items-center justify-between mb-1">
+                        <a href="/accounts/profile/${escapeHtml(encodeURIComponent(reply.author))}/" class="font-medium text-gray-900 dark:text-white hover:text-blue-600 dark:hover:text-blue-400 transition text-sm">${author}</a>
+                        <span class="text-xs text-gray-500 dark:text-gray-400">${escapeHtml(reply.created_at)}</span>
+                    </div>
+                    <p class="text-gray-800 dark:text-gray-200 text-sm">${escapeHtml(reply.content)}</p>
+                </div>
+            </div>
+        </div>
+    `;
+    
+    return replyElement;
+}
+
 // Initialize follower/following modals
 function initFollowerModals() {
     const followersLinks = document.querySelectorAll('.followers-link');
@@ -518,6 +677,142 @@ function loadFollowing(username) {
     });
 }
 
+// Initialize infinite scroll on post listings
+function initInfiniteFeed() {
+    const feed = document.getElementById('post-feed');
+    const pagination = document.getElementById('feed-pagination');
+    
+    if (!feed || !pagination || !('IntersectionObserver' in window)) {
+        return;
+    }
+    
+    let loading = false;
+    const observer = new IntersectionObserver(entries => {
+        if (!entries[0].isIntersecting || loading) {
+            return;
+        }
+        
+        const cursor = pagination.getAttribute('data-next-cursor');
+        if (!cursor) {
+            observer.disconnect();
+            return;
+        }
+        
+        loading = true;
+        const feedUrl = pagination.getAttribute('data-feed-url');
+        const separator = feedUrl.includes('?') ? '&' : '?';
+        
+        fetch(`${feedUrl}${separator}cursor=${encodeURIComponent(cursor)}`, {
+            method: 'GET',
+            credentials: 'same-origin',
+        })
+        .then(response => response.json())
+        .then(data => {
+            const isAuthenticated = !!document.querySelector('meta[name="user-id"]');
+            
+            data.posts.forEach(post => {
+                const card = createPostCard(post, isAuthenticated);
+                feed.appendChild(card);
+                
+                const likeButton = card.querySelector('.like-btn');
+                if (likeButton) {
+                    bindLikeButton(likeButton);
+                }
+            });
+            
+            pagination.setAttribute('data-next-cursor', data.next_cursor || '');
+            
+            const nextLink = pagination.querySelector('.feed-next-link');
+            if (nextLink) {
+                if (data.next_cursor) {
+                    nextLink.href = `?cursor=${encodeURIComponent(data.next_cursor)}`;
+                } else {
+                    nextLink.remove();
+                    observer.disconnect();
+                }
+            }
+        })
+        .catch(error => {
+            console.error('Error loading more posts:', error);
+        })
+        .finally(() => {
+            loading = false;
+        });
+    }, { rootMargin: '400px' });
+    
+    observer.observe(pagination);
+}
+
+// Create a post card element for the feed
+function createPostCard(post, isAuthenticated) {
+    const article = document.createElement('article');
+    article.className = 'bg-white dark:bg-gray-800 rounded-lg shadow-md overflow-hidden hover:shadow-lg transition';
+    
+    const likeClass = post.liked ? 'text-red-500 dark:text-red-400' : '';
+    const likeIcon = post.liked ? 'fas' : 'far';
+    const title = escapeHtml(post.title);
+    const author = escapeHtml(post.author);
+    const url = escapeHtml(post.url);
+    
+    article.innerHTML = `
+        ${post.cover_image ? 
+            `<div class="h-64 bg-gray-100 dark:bg-gray-700">
+                <img src="${escapeHtml(post.cover_image)}" alt="${title}" class="w-full h-full object-contain">
+            </div>` : 
+            ''
+        }
+        <div class="p-6">
+            <div class="flex justify-between items-start mb-2">
+                <h2 class="text-xl font-bold text-gray-800 dark:text-white">
+                    <a href="${url}" class="hover:text-blue-600 dark:hover:text-blue-400 transition">${title}</a>
+                </h2>
+                ${post.category ? 
+                    `<span class="text-xs bg-blue-100 dark:bg-blue-900 text-blue-800 dark:text-blue-200 px-2 py-1 rounded-full">${escapeHtml(post.category)}</span>` : 
+                    ''
+                }
+            </div>
+            <div class="flex items-center text-sm text-gray-600 dark:text-gray-400 mb-4">
+                <a href="/accounts/profile/${escapeHtml(encodeURIComponent(post.author))}/" class="flex items-center hover:text-blue-600 dark:hover:text-blue-400 transition">
+                    ${post.author_avatar ? 
+                        `<img src="${escapeHtml(post.author_avatar)}" alt="${author}" class="w-6 h-6 rounded-full object-cover mr-2">` :
+                        `<div class="w-6 h-6 rounded-full bg-gray-300 dark:bg-gray-600 flex items-center justify-center mr-2">
+                            <span class="text-gray-600 dark:text-gray-300 text-xs">${escapeHtml(post.author.charAt(0).toUpperCase())}</span>
+                        </div>`
+                    }
+                    ${author}
+                </a>
+                <span class="mx-2">•</span>
+                <span>${escapeHtml(post.created_at)}</span>
+            </div>
+            <p class="text-gray-600 dark:text-gray-400 mb-4">${escapeHtml(post.excerpt)}</p>
+            <div class="flex justify-between items-center">
+                <div class="flex space-x-4">
+                    ${isAuthenticated ? 
+                        `<button class="like-btn flex items-center text-gray-500 dark:text-gray-400 hover:text-red-500 dark:hover:text-red-400 transition ${likeClass}" data-post-id="${post.id}" data-liked="${post.liked}">
+                            <i class="${likeIcon} fa-heart"></i>
+                            <span class="likes-count ml-1">${post.likes_count}</span>
+                        </button>` :
+                        `<div class="flex items-center text-gray-500 dark:text-gray-400">
+                            <i class="far fa-heart"></i>
+                            <span class="ml-1">${post.likes_count}</span>
+                        </div>`
+                    }
+                    <a href="${url}#comments" class="flex items-center text-gray-500 dark:text-gray-400 hover:text-blue-600 dark:hover:text-blue-400 transition">
+                        <i class="far fa-comment"></i>
+                        <span class="ml-1">${post.comments_count}</span>
+                    </a>
+                </div>
+                ${post.subcategory ? 
+                    `<a href="/subcategory/${post.subcategory_id}/" class="text-xs text-gray-500 dark:text-gray-400 hover:text-blue-600 dark:hover:text-blue-400 transition">${escapeHtml(post.subcategory)}</a>` : 
+                    ''
+                }
+            </div>
+        </div>
+    `;
+    
+    return article;
+}
+
 // Get CSRF token
 function getCsrfToken() {
     const csrfToken = document.querySelector('meta[name="csrf-token"]');
@@ -294,4 +294,10 @@ function truncateText(text, maxLength) {
         return text;
     }
     return text.substr(0, maxLength) + '...';
+}
+
+// Escape a value for interpolation into an HTML template
+function escapeHtml(value) {
+    const entities = {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'};
+    return String(value ?? '').replace(/[&<>"']/g, char => entities[char]);
 }
\ No newline at end of file
@@ -10,13 +10,18 @@ document.addEventListener('DOMContentLoaded', function() {
     // Initialize conversation list
     initConversationList();
     
-    // Update unread message count periodically
-    updateUnreadMessageCount();
-    setInterval(updateUnreadMessageCount, 60000); // Update every minute
+    // Scroll back through history over the socket
+    initHistoryPaging();
 });
 
 // Connect to WebSocket for real-time messaging
 let chatSocket = null;
+let chatHeartbeat = null;
+
+// Keep in step with messaging/presence.py
+const PRESENCE_HEARTBEAT_INTERVAL = 25000;
+const TYPING_THROTTLE = 3000;
+const TYPING_DISPLAY_TIME = 5000;
 
 function connectChatWebSocket() {
     const userId = document.querySelector('meta[name="user-id"]');
@@ -26,6 +31,16 @@ function connectChatWebSocket() {
             'ws://' + window.location.host + '/ws/chat/'
         );
         
+        chatSocket.onopen = function() {
+            // Catch up once; after that the server pushes every change
+            updateUnreadMessageCount();
+            
+            // Keep this user marked online while the page is open
+            chatHeartbeat = setInterval(() => {
+                chatSocket.send(JSON.stringify({'action': 'heartbeat'}));
+            }, PRESENCE_HEARTBEAT_INTERVAL);
+        };
+        
         chatSocket.onmessage = function(e) {
             const data = JSON.parse(e.data);
             
@@ -33,10 +48,21 @@ function connectChatWebSocket() {
                 handleNewMessage(data.message_data);
             } else if (data.type === 'message_sent') {
                 handleMessageSent(data.message_data);
+            } else if (data.type === 'history') {
+                handleHistory(data);
+            } else if (data.type === 'presence_snapshot') {
+                handlePresenceSnapshot(data.online);
+            } else if (data.type === 'presence') {
+                setPresence(data.user_id, data.online);
+            } else if (data.type === 'typing') {
+                handleTyping(data);
+            } else if (data.type === 'unread_count') {
+                setMessageBadge(data.unread_count);
             }
         };
         
         chatSocket.onclose = function(e) {
+            clearInterval(chatHeartbeat);
             console.error('Chat socket closed unexpectedly. Attempting to reconnect...');
             setTimeout(() => {
                 connectChatWebSocket();
@@ -51,14 +77,7 @@ function connectChatWebSocket() {
 
 // Handle new message received
 function handleNewMessage(messageData) {
-    // Update unread message count
-    const messageBadge = document.getElementById('message-badge');
-    if (messageBadge) {
-        const currentCount = parseInt(messageBadge.textContent) || 0;
-        messageBadge.textContent = currentCount + 1;
-        messageBadge.classList.remove('hidden');
-        messageBadge.classList.add('notification-badge');
-    }
+    // The badge is updated by the unread_count event pushed once the message is stored
     
     // Add to conversation list
     const conversationList = document.getElementById('conversation-list');
@@ -80,6 +99,12 @@ function handleNewMessage(messageData) {
     if (currentConversationId && parseInt(currentConversationId.getAttribute('content')) === messageData.conversation_id) {
         addMessageToConversation(messageData);
         
+        // A message ends the typing indicator
+        const indicator = document.getElementById('typing-indicator');
+        if (indicator) {
+            indicator.classList.add('hidden');
+        }
+        
         // Mark messages as read
         markMessagesAsRead(messageData.conversation_id);
     }
@@ -88,6 +113,39 @@ function handleNewMessage(messageData) {
     showToast(`New message from ${messageData.sender_username}`, 'info');
 }
 
+// Show whether the other participant is online
+function setPresence(userId, online) {
+    const status = document.getElementById('presence-status');
+    if (status && parseInt(status.getAttribute('data-user-id')) === userId) {
+        status.textContent = online ? 'Online' : 'Offline';
+    }
+}
+
+function handlePresenceSnapshot(onlineIds) {
+    const status = document.getElementById('presence-status');
+    if (status) {
+        const userId = parseInt(status.getAttribute('data-user-id'));
+        setPresence(userId, onlineIds.includes(userId));
+    }
+}
+
+// Show the typing indicator for a few seconds after each typing event
+let typingTimeout = null;
+
+function handleTyping(data) {
+    const status = document.getElementById('presence-status');
+    const indicator = document.getElementById('typing-indicator');
+    if (!status || !indicator || parseInt(status.getAttribute('data-user-id')) !== data.user_id) {
+        return;
+    }
+    
+    indicator.classList.remove('hidden');
+    clearTimeout(typingTimeout);
+    typingTimeout = setTimeout(() => {
+        indicator.classList.add('hidden');
+    }, TYPING_DISPLAY_TIME);
+}
+
 // Handle message sent confirmation
 function handleMessageSent(messageData) {
     // Add to message list if in the same conversation
@@ -115,18 +173,18 @@ function createConversationItem(messageData) {
         <div class="flex items-center">
             <div class="flex-shrink-0">
                 ${messageData.sender_avatar ? 
-                    `<img class="h-12 w-12 rounded-full object-cover" src="${messageData.sender_avatar}" alt="${messageData.sender_username}">` :
+                    `<img class="h-12 w-12 rounded-full object-cover" src="${escapeHtml(messageData.sender_avatar)}" alt="${escapeHtml(messageData.sender_username)}">` :
                     `<div class="h-12 w-12 rounded-full bg-gray-300 dark:bg-gray-600 flex items-center justify-center">
-                        <span class="text-gray-600 dark:text-gray-300 font-medium">${messageData.sender_username.charAt(0).toUpperCase()}</span>
+                        <span class="text-gray-600 dark:text-gray-300 font-medium">${escapeHtml(messageData.sender_username.charAt(0).toUpperCase())}</span>
                     </div>`
                 }
             </div>
             <div class="ml-4 flex-1 min-w-0">
                 <div class="flex items-center justify-between">
-                    <p class="text-sm font-medium text-gray-900 dark:text-white truncate">${messageData.sender_username}</p>
+                    <p class="text-sm font-medium text-gray-900 dark:text-white truncate">${escapeHtml(messageData.sender_username)}</p>
                     <p class="text-xs text-gray-500 dark:text-gray-400">${formatDate(messageData.created_at)}</p>
                 </div>
-                <p class="text-sm text-gray-500 dark:text-gray-400 truncate">${truncateText(messageData.content, 30)}</p>
+                <p class="text-sm text-gray-500 dark:text-gray-400 truncate">${escapeHtml(truncateText(messageData.content, 30))}</p>
             </div>
             <div class="ml-2 flex-shrink-0">
                 <span class="w-2 h-2 rounded-full bg-blue-500 inline-block"></span>
@@ -175,6 +233,11 @@ function addMessageToConversation(messageData) {
     const messageContainer = document.getElementById('message-container');
     if (!messageContainer) return;
     
+    messageContainer.appendChild(createMessageElement(messageData));
+}
+
+// Create message element
+function createMessageElement(messageData) {
     const messageElement = document.createElement('div');
     messageElement.className = 'flex mb-4';
     
@@ -187,7 +250,7 @@ function addMessageToConversation(messageData) {
         messageElement.innerHTML = `
             <div class="max-w-xs lg:max-w-md">
                 <div class="bg-blue-500 text-white rounded-lg px-4 py-2">
-                    <p>${messageData.content}</p>
+                    <p>${escapeHtml(messageData.content)}</p>
                 </div>
                 <p class="text-xs text-gray-500 dark:text-gray-400 mt-1 text-right">${formatDate(messageData.created_at)}</p>
             </div>
@@ -196,22 +259,65 @@ function addMessageToConversation(messageData) {
         messageElement.innerHTML = `
             <div class="flex-shrink-0 mr-3">
                 ${messageData.sender_avatar ? 
-                    `<img class="h-10 w-10 rounded-full object-cover" src="${messageData.sender_avatar}" alt="${messageData.sender_username}">` :
+                    `<img class="h-10 w-10 rounded-full object-cover" src="${escapeHtml(messageData.sender_avatar)}" alt="${escapeHtml(messageData.sender_username)}">` :
                     `<div class="h-10 w-10 rounded-full bg-gray-300 dark:bg-gray-600 flex items-center justify-center">
-                        <span class="text-gray-600 dark:text-gray-300 font-medium">${messageData.sender_username.charAt(0).toUpperCase()}</span>
+                        <span class="text-gray-600 dark:text-gray-300 font-medium">${escapeHtml(messageData.sender_username.charAt(0).toUpperCase())}</span>
                     </div>`
                 }
             </div>
             <div class="max-w-xs lg:max-w-md">
                 <div class="bg-gray-200 dark:bg-gray-700 text-gray-800 dark:text-white rounded-lg px-4 py-2">
-                    <p>${messageData.content}</p>
+                    <p>${escapeHtml(messageData.content)}</p>
                 </div>
                 <p class="text-xs text-gray-500 dark:text-gray-400 mt-1">${formatDate(messageData.created_at)}</p>
             </div>
         `;
     }
     
-    messageContainer.appendChild(messageElement);
+    return messageElement;
+}
+
+// Load earlier messages over the socket instead of a page reload
+function initHistoryPaging() {
+    const loadEarlierLink = document.getElementById('load-earlier-messages');
+    const currentConversationId = document.querySelector('meta[name="current-conversation-id"]');
+    if (!loadEarlierLink || !currentConversationId) return;
+    
+    loadEarlierLink.addEventListener('click', function(e) {
+        if (!chatSocket || chatSocket.readyState !== WebSocket.OPEN) {
+            return; // Fall back to the plain link
+        }
+        
+        e.preventDefault();
+        chatSocket.send(JSON.stringify({
+            'action': 'fetch_history',
+            'conversation_id': parseInt(currentConversationId.getAttribute('content')),
+            'before': loadEarlierLink.dataset.before
+        }));
+    });
+}
+
+// Prepend a page of earlier messages, keeping the scroll position
+function handleHistory(data) {
+    const messageContainer = document.getElementById('message-container');
+    const loadEarlierLink = document.getElementById('load-earlier-messages');
+    if (!messageContainer || !loadEarlierLink || data.error) return;
+    
+    const anchor = loadEarlierLink.parentElement;
+    const firstMessage = anchor.nextElementSibling;
+    const previousHeight = messageContainer.scrollHeight;
+    data.messages.forEach(messageData => {
+        messageContainer.insertBefore(createMessageElement(messageData), firstMessage);
+    });
+    
+    if (data.before) {
+        loadEarlierLink.dataset.before = data.before;
+        loadEarlierLink.href = `?before=${data.before}`;
+    } else {
+        anchor.remove();
+    }
+    
+    messageContainer.scrollTop += messageContainer.scrollHeight - previousHeight;
 }
 
 // Initialize message form
@@ -240,6 +346,26 @@ function initMessageForm() {
                 messageInput.focus();
             }
         });
+        
+        // Tell the other participant we're typing, at most once per throttle window
+        const messageInput = document.getElementById('message-input');
+        let lastTypingSent = 0;
+        if (messageInput) {
+            messageInput.addEventListener('input', function() {
+                const recipientId = document.getElementById('recipient-id');
+                const conversationId = document.querySelector('meta[name="current-conversation-id"]');
+                const now = Date.now();
+                
+                if (chatSocket && recipientId && now - lastTypingSent >= TYPING_THROTTLE) {
+                    lastTypingSent = now;
+                    chatSocket.send(JSON.stringify({
+                        'action': 'typing',
+                        'recipient_id': recipientId.value,
+                        'conversation_id': conversationId ? parseInt(conversationId.getAttribute('content')) : null
+                    }));
+                }
+            });
+        }
     }
 }
 
@@ -290,22 +416,22 @@ function loadConversations() {
                         <div class="flex items-center">
                             <div class="flex-shrink-0">
                                 ${conversation.other_participant_avatar ? 
-                                    `<img class="h-12 w-12 rounded-full object-cover" src="${conversation.other_participant_avatar}" alt="${conversation.other_participant_username}">` :
+                                    `<img class="h-12 w-12 rounded-full object-cover" src="${escapeHtml(conversation.other_participant_avatar)}" alt="${escapeHtml(conversation.other_participant_username)}">` :
                                     `<div class="h-12 w-12 rounded-full bg-gray-300 dark:bg-gray-600 flex items-center justify-center">
-                                        <span class="text-gray-600 dark:text-gray-300 font-medium">${conversation.other_participant_username.charAt(0).toUpperCase()}</span>
+                                        <span class="text-gray-600 dark:text-gray-300 font-medium">${escapeHtml(conversation.other_participant_username.charAt(0).toUpperCase())}</span>
                                     </div>`
                                 }
                             </div>
                             <div class="ml-4 flex-1 min-w-0">
                                 <div class="flex items-center justify-between">
-                                    <p class="text-sm font-medium text-gray-900 dark:text-white truncate">${conversation.other_participant_username}</p>
+                                    <p class="text-sm font-medium text-gray-900 dark:text-white truncate">${escapeHtml(conversation.other_participant_username)}</p>
                                     ${conversation.last_message ? 
                                         `<p class="text-xs text-gray-500 dark:text-gray-400">${formatDate(conversation.last_message.created_at)}</p>` : 
                                         ''
                                     }
                                 </div>
                                 ${conversation.last_message ? 
-                                    `<p class="text-sm text-gray-500 dark:text-gray-400 truncate">${truncateText(conversation.last_message.content, 30)}</p>` : 
+                                    `<p class="text-sm text-gray-500 dark:text-gray-400 truncate">${escapeHtml(truncateText(conversation.last_message.content, 30))}</p>` : 
                                     `<p class="text-sm text-gray-500 dark:text-gray-400">No messages yet</p>`
                                 }
                             </div>
@@ -331,30 +457,30 @@ function loadConversations() {
 // Update unread message count
 function updateUnreadMessageCount() {
     fetch('/messaging/api/unread-count/', {
-        method: 'POST',
-        headers: {
-            'X-CSRFToken': getCsrfToken(),
-            'Content-Type': 'application/json',
-        },
+        method: 'GET',
         credentials: 'same-origin',
     })
     .then(response => response.json())
     .then(data => {
-        const messageBadge = document.getElementById('message-badge');
-        if (messageBadge) {
-            if (data.unread_count > 0) {
-                messageBadge.textContent = data.unread_count;
-                messageBadge.classList.remove('hidden');
-            } else {
-                messageBadge.classList.add('hidden');
-            }
-        }
+        setMessageBadge(data.unread_count);
     })
     .catch(error => {
         console.error('Error updating unread message count:', error);
     });
 }
 
+function setMessageBadge(count) {
+    const messageBadge = document.getElementById('message-badge');
+    if (messageBadge) {
+        if (count > 0) {
+            messageBadge.textContent = count;
+            messageBadge.classList.remove('hidden');
+        } else {
+            messageBadge.classList.add('hidden');
+        }
+    }
+}
+
 // Mark messages as read
 function markMessagesAsRead(conversationId) {
     if (chatSocket) {
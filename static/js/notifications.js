@@ -6,10 +6,6 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Initialize notification actions
     initNotificationActions();
-    
-    // Update notification count periodically
-    updateNotificationCount();
-    setInterval(updateNotificationCount, 60000); // Update every minute
 });
 
 // Connect to WebSocket for real-time notifications
@@ -21,15 +17,29 @@ function connectNotificationWebSocket() {
             'ws://' + window.location.host + '/ws/notifications/'
         );
         
+        let heartbeat = null;
+        notificationSocket.onopen = function() {
+            // Catch up once; after that the server pushes every change
+            updateNotificationCount();
+            
+            // Keep this user marked online while the page is open
+            heartbeat = setInterval(() => {
+                notificationSocket.send(JSON.stringify({'action': 'heartbeat'}));
+            }, 25000);
+        };
+        
         notificationSocket.onmessage = function(e) {
             const data = JSON.parse(e.data);
             
             if (data.type === 'notification') {
                 handleNewNotification(data.notification_data);
+            } else if (data.type === 'unread_count') {
+                setNotificationBadge(data.unread_count);
             }
         };
         
         notificationSocket.onclose = function(e) {
+            clearInterval(heartbeat);
             console.error('Notification socket closed unexpectedly. Attempting to reconnect...');
             setTimeout(() => {
                 connectNotificationWebSocket();
@@ -44,18 +54,17 @@ function connectNotificationWebSocket() {
 
 // Handle new notification
 function handleNewNotification(notificationData) {
-    // Update notification count
-    const notificationBadge = document.getElementById('notification-badge');
-    if (notificationBadge) {
-        const currentCount = parseInt(notificationBadge.textContent) || 0;
-        notificationBadge.textContent = currentCount + 1;
-        notificationBadge.classList.remove('hidden');
-        notificationBadge.classList.add('notification-badge');
-    }
+    // The badge is updated by the unread_count event that accompanies it
     
     // Add to notification dropdown
     const notificationDropdown = document.getElementById('notification-dropdown');
     if (notificationDropdown) {
+        // An aggregated notification that gained actors replaces its earlier copy
+        const staleItem = notificationDropdown.querySelector(`.notification-item[data-notification-id="${notificationData.id}"]`);
+        if (staleItem) {
+            staleItem.remove();
+        }
+        
         const notificationItem = createNotificationItem(notificationData);
         
         // Add to the top of the list
@@ -76,6 +85,7 @@ function createNotificationItem(notificationData) {
     const item = document.createElement('a');
     item.className = 'notification-item block px-4 py-3 hover:bg-gray-100 dark:hover:bg-gray-700 border-b border-gray-200 dark:border-gray-700';
     item.href = '#';
+    item.setAttribute('data-notification-id', notificationData.id);
     
     // Determine notification icon
     let iconClass = 'fa-bell';
@@ -91,7 +101,9 @@ function createNotificationItem(notificationData) {
     
     // Determine notification link
     let link = '#';
-    if (notificationData.related_object_id) {
+    if (notificationData.target_url) {
+        link = notificationData.target_url;
+    } else if (notificationData.related_object_id) {
         if (notificationData.notification_type === 'like' || notificationData.notification_type === 'comment') {
             link = `/post/${notificationData.related_object_id}/`;
         } else if (notificationData.notification_type === 'reply') {
@@ -231,21 +243,25 @@ function updateNotificationCount() {
     })
     .then(response => response.json())
     .then(data => {
-        const notificationBadge = document.getElementById('notification-badge');
-        if (notificationBadge) {
-            if (data.unread_count > 0) {
-                notificationBadge.textContent = data.unread_count;
-                notificationBadge.classList.remove('hidden');
-            } else {
-                notificationBadge.classList.add('hidden');
-            }
-        }
+        setNotificationBadge(data.unread_count);
     })
     .catch(error => {
         console.error('Error updating notification count:', error);
     });
 }
 
+function setNotificationBadge(count) {
+    const notificationBadge = document.getElementById('notification-badge');
+    if (notificationBadge) {
+        if (count > 0) {
+            notificationBadge.textContent = count;
+            notificationBadge.classList.remove('hidden');
+        } else {
+            notificationBadge.classList.add('hidden');
+        }
+    }
+}
+
 // Get CSRF token
 function getCsrfToken() {
     const csrfToken = document.querySelector('meta[name="csrf-token"]');
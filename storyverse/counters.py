@@ -0,0 +1,88 @@
+import logging
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from django.db import transaction
+
+
+logger = logging.getLogger(__name__)
+
+# A drifted counter corrects itself at the latest this long after it was computed
+COUNTER_TIMEOUT = 60 * 60
+
+
+class UnreadCounter:
+    """
+    A per-user unread count kept in the cache and pushed to the user's sockets when it changes.
+    
+    ``compute(user_id)`` is the one aggregate query that fills a missing
+    counter. Writes call ``adjust`` or ``refresh`` once their transaction
+    commits, and the user's group gets an ``unread_count`` event carrying
+    the delta and the new total, so clients never need to poll.
+    """
+    
+    def __init__(self, name, group, compute):
+        self.name = name
+        self.group = group
+        self.compute = compute
+    
+    def key(self, user_id):
+        return f'{self.name}:{user_id}'
+    
+    def get(self, user_id):
+        count = cache.get(self.key(user_id))
+        if count is None:
+            count = self.compute(user_id)
+            cache.set(self.key(user_id), count, COUNTER_TIMEOUT)
+        return count
+    
+    async def aget(self, user_id):
+        return await sync_to_async(self.get)(user_id)
+    
+    def adjust(self, user_id, delta):
+        """Add ``delta`` to a user's count after the current transaction commits."""
+        if delta:
+            transaction.on_commit(lambda: self._apply(user_id, delta))
+    
+    def refresh(self, user_id):
+        """Recompute a user's count after the current transaction commits."""
+        transaction.on_commit(lambda: self._apply(user_id, None))
+    
+    def _apply(self, user_id, delta):
+        key = self.key(user_id)
+        count = None
+        if delta is None:
+            cache.delete(key)
+        else:
+            try:
+                count = cache.incr(key, delta)
+            except ValueError:
+                # Not cached: the next read computes it from scratch
+                pass
+            else:
+                if count < 0:
+                    cache.delete(key)
+                    count = None
+        
+        if count is None:
+            count = self.get(user_id)
+        self.push(user_id, delta, count)
+    
+    def push(self, user_id, delta, count):
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        
+        try:
+            async_to_sync(channel_layer.group_send)(
+                self.group.format(user_id=user_id),
+                {
+                    'type': 'unread_count',
+                    'counter': self.name,
+                    'delta': delta,
+                    'unread_count': count
+                }
+            )
+        except Exception:
+            # The count is already stored; clients pick it up on their next read
+            logger.exception('Failed to push %s for user %s', self.name, user_id)
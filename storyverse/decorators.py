@@ -0,0 +1,28 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+
+
+async def aget_user(request):
+    """
+    Resolve ``request.user`` off the event loop and return it.
+    
+    The user is loaded lazily from the session on first access, which hits
+    the database, so async views await this before touching ``request.user``.
+    Afterwards the resolved user is cached on the request.
+    """
+    await sync_to_async(lambda: request.user.is_authenticated)()
+    return request.user
+
+
+def async_login_required(view_func):
+    """``login_required`` for ``async def`` views."""
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        user = await aget_user(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view_func(request, *args, **kwargs)
+    
+    return wrapper
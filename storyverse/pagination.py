@@ -0,0 +1,103 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class CursorPage:
+    """
+    A page of rows fetched by keyset pagination on ``(created_at, id)``.
+    
+    Iterates like a ``django.core.paginator.Page`` so listing templates can
+    loop over it directly.
+    """
+    
+    def __init__(self, object_list, next_cursor=None, cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.cursor = cursor
+    
+    def __iter__(self):
+        return iter(self.object_list)
+    
+    def __len__(self):
+        return len(self.object_list)
+    
+    def __bool__(self):
+        return bool(self.object_list)
+    
+    def has_next(self):
+        return self.next_cursor is not None
+    
+    def has_previous(self):
+        return self.cursor is not None
+    
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def encode_cursor(created_at, pk):
+    token = f'{created_at.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(token.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return ``(created_at, pk)`` for an opaque cursor, or ``None`` if it is malformed."""
+    if not cursor:
+        return None
+    
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, TypeError, UnicodeDecodeError):
+        return None
+
+
+def _cursor_queryset(queryset, position, descending):
+    if descending:
+        queryset = queryset.order_by('-created_at', '-id')
+        if position:
+            created_at, pk = position
+            queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+    else:
+        queryset = queryset.order_by('created_at', 'id')
+        if position:
+            created_at, pk = position
+            queryset = queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+    return queryset
+
+
+def _cursor_page(rows, per_page, cursor, position):
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].pk)
+    
+    return CursorPage(rows, next_cursor=next_cursor, cursor=cursor if position else None)
+
+
+def cursor_rows(queryset, position=None, limit=10, descending=True):
+    """Fetch up to ``limit`` rows of ``queryset`` past a decoded ``(created_at, pk)`` position."""
+    return list(_cursor_queryset(queryset, position, descending)[:limit])
+
+
+def paginate_by_cursor(queryset, cursor=None, per_page=10, descending=True):
+    """
+    Return one ``CursorPage`` of ``queryset`` ordered on ``(created_at, id)``.
+    
+    ``descending`` walks from newest to oldest (the cursor marks the last row
+    seen); otherwise rows are walked oldest to newest. Each page is a single
+    indexed range scan with no COUNT and no OFFSET, so deep pages cost the same
+    as the first one. A malformed cursor falls back to the first page.
+    """
+    position = decode_cursor(cursor)
+    rows = cursor_rows(queryset, position, per_page + 1, descending)
+    return _cursor_page(rows, per_page, cursor, position)
+
+
+async def apaginate_by_cursor(queryset, cursor=None, per_page=10, descending=True):
+    """Async version of ``paginate_by_cursor`` for async views."""
+    position = decode_cursor(cursor)
+    rows = [row async for row in _cursor_queryset(queryset, position, descending)[:per_page + 1]]
+    return _cursor_page(rows, per_page, cursor, position)
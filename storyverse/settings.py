@@ -57,6 +57,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'blog.context_processors.sidebar',
             ],
         },
     },
@@ -80,6 +81,20 @@ if 'DATABASE_URL' in os.environ:
     import dj_database_url
     DATABASES['default'] = dj_database_url.config(conn_max_age=600, ssl_require=False)
 
+# Cache
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Use Redis if REDIS_URL is set so every worker shares one cache
+if 'REDIS_URL' in os.environ:
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -137,6 +152,30 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Messaging
+# Write-behind fans chat messages out before they are stored, then persists
+# them in batches. Each process needs its own MESSAGING_WORKER_ID (0-1023)
+# so the message ids it assigns never collide with another process's.
+MESSAGING_WRITE_BEHIND = os.environ.get('MESSAGING_WRITE_BEHIND', 'False') == 'True'
+MESSAGING_WRITE_BATCH_SIZE = int(os.environ.get('MESSAGING_WRITE_BATCH_SIZE', '100'))
+MESSAGING_WRITE_FLUSH_INTERVAL = float(os.environ.get('MESSAGING_WRITE_FLUSH_INTERVAL', '0.005'))  # seconds
+MESSAGING_WORKER_ID = int(os.environ.get('MESSAGING_WORKER_ID', '0'))
+# archive_messages moves messages older than this into compressed segments
+MESSAGING_ARCHIVE_AFTER_DAYS = int(os.environ.get('MESSAGING_ARCHIVE_AFTER_DAYS', '180'))
+
+# Notifications
+# Likes, comments and follows on the same target within this window are
+# merged into one unread notification ("alice and 41 others liked your post")
+NOTIFICATION_AGGREGATION_WINDOW = int(os.environ.get('NOTIFICATION_AGGREGATION_WINDOW', '86400'))  # seconds
+# prune_notifications deletes notifications older than these many days, by
+# type and read state; None keeps them forever
+NOTIFICATION_RETENTION_DAYS = {
+    'follow': {'read': 90, 'unread': 365},
+    'like': {'read': 30, 'unread': 90},
+    'comment': {'read': 90, 'unread': 365},
+    'reply': {'read': 90, 'unread': 365},
+}
+
 # Authentication
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'home'